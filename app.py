@@ -1,9 +1,10 @@
 import os
-import requests
 import json
-import time
-from flask import Flask, jsonify, request, render_template
-from utilities import analyze
+import shutil
+import tempfile
+import zipfile
+from flask import Flask, Response, jsonify, request, render_template
+from utilities import analyze, bulk, caching, cluster, coalescer, export, insights, gemini_client, metrics, roster, simulate, warmup
 
 
 app = Flask(__name__)
@@ -12,13 +13,89 @@ app = Flask(__name__)
 # It keeps our API key safe and off of GitHub.
 GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY", "")
 
+# Uploads are read this many rows at a time so big class exports don't blow up worker memory.
+# Set it to 0 to load the whole CSV at once.
+ANALYZE_CHUNK_ROWS = int(os.environ.get("ANALYZE_CHUNK_ROWS", analyze.STREAM_CHUNK_ROWS))
+
+# Teachers re-upload the same class CSV a lot: keep finished group analyses (charts + AI insight),
+# keyed by the upload's content hash and the model/centroid version.
+RESULT_CACHE = caching.ResultCache(
+    max_entries=int(os.environ.get("RESULT_CACHE_SIZE", 128)),
+    ttl=float(os.environ.get("RESULT_CACHE_TTL", 24 * 3600)),
+    disk_dir=os.environ.get("RESULT_CACHE_DIR") or None
+)
+
+# Opt-in class-local clustering (/analyzeGroup with recluster=1): both models are refit on the
+# uploaded class, warm-started from the pretrained centroids, within this budget per model.
+RECLUSTER_MAX_ITER = int(os.environ.get("RECLUSTER_MAX_ITER", cluster.MAX_ITER))
+RECLUSTER_TIME_BUDGET = float(os.environ.get("RECLUSTER_TIME_BUDGET_MS", cluster.TIME_BUDGET * 1000)) / 1000
+
+# /analyzeBulk: one school's class CSVs (or zips of them) analysed in parallel worker processes.
+# BULK_WORKERS processes per app worker (default: CPU count), BULK_FILE_TIMEOUT_S per class.
+BULK_ANALYZER = bulk.BulkAnalyzer(
+    max_workers=int(os.environ.get("BULK_WORKERS", 0)) or None,
+    timeout=float(os.environ.get("BULK_FILE_TIMEOUT_S", 60)),
+    chunksize=ANALYZE_CHUNK_ROWS or analyze.STREAM_CHUNK_ROWS,
+    max_files=int(os.environ.get("BULK_MAX_FILES", 500)),
+    max_bytes=int(float(os.environ.get("BULK_MAX_MB", 1024)) * 2**20)
+)
+
+# Persistent class rosters (/roster/<class_id>): delta uploads keyed on Student_ID only rescore
+# the rows they contain. ROSTER_DB is a SQLite file shared by every worker on the host.
+ROSTER_STORE = roster.RosterStore(os.environ.get("ROSTER_DB") or roster.DEFAULT_PATH)
+
+# /simulate: what-if grids for one student, at most SIMULATE_MAX_SCENARIOS scenarios per request
+SIMULATE_MAX_SCENARIOS = int(os.environ.get("SIMULATE_MAX_SCENARIOS", simulate.MAX_SCENARIOS))
+
+INSIGHT_UNCONFIGURED = "<h3>⚠️ Configuration Needed</h3><ul><li><b>Note:</b> AI insights are currently unavailable because the API Key is not configured on the server.</li></ul>"
+INSIGHT_DELAYED = "<h3>⚠️ Insight Delay</h3><ul><li>The AI advisor is currently processing a high volume of requests. Please review the raw charts above and try again in a moment.</li></ul>"
+INSIGHT_PENDING = "<h3>⏳ Generating Insights</h3><ul><li>The AI advisor is reviewing these results. The charts are ready above.</li></ul>"
+
+# Charts are returned straight away and the AI insight is generated in the background,
+# then fetched by the page from /insight/<job_id>. Set ASYNC_INSIGHTS=0 to wait for it inline.
+ASYNC_INSIGHTS = os.environ.get("ASYNC_INSIGHTS", "1") != "0"
+INSIGHT_JOBS = insights.InsightJobs(
+    max_workers=int(os.environ.get("INSIGHT_WORKERS", 4)),
+    max_pending=int(os.environ.get("INSIGHT_MAX_PENDING", 64)),
+    store_dir=os.environ.get("INSIGHT_JOB_DIR", os.path.join(tempfile.gettempdir(), "insight-jobs")),
+    fallback=INSIGHT_DELAYED
+)
+
+# One pooled keep-alive client per worker. The rate limit is shared by all workers on the host,
+# and a circuit breaker answers instantly while the API is degraded.
+GEMINI_CLIENT = gemini_client.GeminiClient(
+    GEMINI_API_KEY,
+    base_url=os.environ.get("GEMINI_API_BASE", gemini_client.DEFAULT_BASE_URL),
+    rate_per_minute=int(os.environ.get("GEMINI_RATE_PER_MIN", 60)),
+    bucket_path=os.environ.get("GEMINI_BUCKET_FILE") or None
+)
+
+# Near-identical summaries (same rounded percentages / bucketed metrics) share one Gemini call
+INSIGHT_CACHE = insights.InsightCache(
+    max_entries=int(os.environ.get("INSIGHT_CACHE_SIZE", 1024)),
+    ttl=float(os.environ.get("INSIGHT_CACHE_TTL", 6 * 3600)),
+    percent_step=float(os.environ.get("INSIGHT_PERCENT_STEP", insights.PERCENT_STEP))
+)
+
+# Optional micro-batching of /analyzeStudent: records arriving within STUDENT_BATCH_WINDOW_MS
+# (or up to STUDENT_BATCH_SIZE of them) are scored as one matrix. 0 (default) turns it off.
+STUDENT_BATCH_WINDOW_MS = float(os.environ.get("STUDENT_BATCH_WINDOW_MS", 0))
+STUDENT_COALESCER = coalescer.RequestCoalescer(
+    analyze.visualise_records,
+    window_ms=STUDENT_BATCH_WINDOW_MS,
+    max_batch=int(os.environ.get("STUDENT_BATCH_SIZE", 64))
+) if STUDENT_BATCH_WINDOW_MS > 0 else None
+
 def get_ai_insight(data_summary):
-    """Calls Gemini API to generate structured pedagogical insights with exponential backoff."""
+    """Structured pedagogical insights for a summary, memoised on its quantised form."""
     if not GEMINI_API_KEY:
-        return "<h3>⚠️ Configuration Needed</h3><ul><li><b>Note:</b> AI insights are currently unavailable because the API Key is not configured on the server.</li></ul>"
+        return INSIGHT_UNCONFIGURED
 
-    url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash-preview-09-2025:generateContent?key={GEMINI_API_KEY}"
-    
+    return INSIGHT_CACHE.get_or_fetch(data_summary, request_ai_insight) or INSIGHT_DELAYED
+
+def request_ai_insight(data_summary):
+    """Asks Gemini for structured pedagogical insights.
+    Returns None when no insight could be obtained (rate limited, upstream down...)."""
     prompt = f"""
     As an AI Education Consultant, analyze this JSON data: {json.dumps(data_summary)}
     
@@ -41,25 +118,51 @@ def get_ai_insight(data_summary):
     </ul>
     """
 
-    payload = {
-        "contents": [{"parts": [{"text": prompt}]}]
-    }
+    with metrics.stage("ai_call"):
+        return GEMINI_CLIENT.generate(prompt)
 
-    # Exponential Backoff for production stability
-    for i in range(5):
-        try:
-            response = requests.post(url, json=payload, timeout=10)
-            if response.status_code == 200:
-                result = response.json()
-                return result['candidates'][0]['content']['parts'][0]['text']
-            elif response.status_code == 429: # Rate limit
-                time.sleep(2**i)
-            else:
-                break
-        except Exception:
-            time.sleep(2**i)
+def attach_insight(analysis_results, summary, on_ready=None):
+    """
+    Fills analysis_results['ai_insight']. Cached insights (and the sync mode) are
+    inlined; otherwise a background job is started and its id returned as
+    'insight_job'. on_ready(insight) is called once the insight exists.
+    """
+    if is_warmup():
+        return analysis_results # worker warm-up: no Gemini call, nothing cached
+
+    insight = INSIGHT_CACHE.peek(summary) if GEMINI_API_KEY else INSIGHT_UNCONFIGURED
 
-    return "<h3>⚠️ Insight Delay</h3><ul><li>The AI advisor is currently processing a high volume of requests. Please review the raw charts above and try again in a moment.</li></ul>"
+    if insight is None and ASYNC_INSIGHTS:
+        job_id = INSIGHT_JOBS.submit(get_ai_insight, summary, on_done=on_ready)
+        if job_id is not None:
+            analysis_results['ai_insight'] = INSIGHT_PENDING
+            analysis_results['insight_job'] = job_id
+            return analysis_results
+        insight = INSIGHT_DELAYED # background queue is full, don't block the worker either
+    elif insight is None:
+        insight = get_ai_insight(summary)
+
+    analysis_results['ai_insight'] = insight
+    if on_ready is not None:
+        on_ready(insight)
+    return analysis_results
+
+def is_warmup():
+    """True for the worker's own warm-up requests (see utilities/warmup.py)."""
+    return bool(request.environ.get(warmup.ENVIRON_KEY))
+
+# Stage timings (see utilities/metrics.py) go out as a Server-Timing header and into /metrics.
+# METRICS=0 turns them off; set METRICS_DIR so /metrics sums every gunicorn worker.
+@app.before_request
+def start_timing():
+    metrics.begin_request(record=not is_warmup()) # warm-up requests stay out of the metrics
+
+@app.after_request
+def add_server_timing(response):
+    timing = metrics.end_request(request.url_rule.rule if request.url_rule else "unmatched")
+    if timing:
+        response.headers["Server-Timing"] = timing
+    return response
 
 @app.route('/')
 def home():
@@ -68,15 +171,132 @@ def home():
 @app.route("/analyzeGroup", methods=["POST"])
 def analyze_group():
     file = request.files["csv_file"]
-    analysis_results = analyze.visualise(file)
-    
+    recluster = (request.values.get("recluster") or "").lower() in ("1", "true", "yes", "on")
+
+    with metrics.stage("hash_upload"):
+        cache_key = f"{caching.hash_stream(file.stream)}:{analyze.pipeline_version()}"
+    file.stream.seek(0, os.SEEK_END)
+    metrics.observe("upload_bytes", file.stream.tell())
+    file.stream.seek(0)
+    if recluster:
+        cache_key += f":local-{RECLUSTER_MAX_ITER}-{RECLUSTER_TIME_BUDGET}"
+    analysis_results = None if is_warmup() else RESULT_CACHE.get(cache_key)
+
+    if analysis_results is None:
+        try:
+            if recluster:
+                analysis_results = analyze.visualise_local(file, RECLUSTER_MAX_ITER, RECLUSTER_TIME_BUDGET)
+            else:
+                analysis_results = analyze.visualise(file, chunksize=ANALYZE_CHUNK_ROWS)
+        except (ValueError, KeyError) as exc:
+            return jsonify({"error": str(exc)}), 400
+    elif analysis_results['ai_insight'] not in (INSIGHT_UNCONFIGURED, INSIGHT_DELAYED):
+        return jsonify(analysis_results)
+
+    # Fresh analysis, or a cached one whose AI call failed last time. attach_insight
+    # sets keys on the dict, and a cached entry is shared with other requests: work on a copy
+    analysis_results = dict(analysis_results)
+    charts = {k: v for k, v in analysis_results.items() if k not in ('ai_insight', 'insight_job')}
     summary = {
         "type": "batch",
-        "clusters": analysis_results['charts']['academic_distribution']
+        "clusters": charts['charts']['academic_distribution']
     }
-    analysis_results['ai_insight'] = get_ai_insight(summary)
+    # The result is cached once the insight is there (possibly from the background job)
+    attach_insight(analysis_results, summary,
+                   on_ready=lambda insight: RESULT_CACHE.set(cache_key, dict(charts, ai_insight=insight)))
     return jsonify(analysis_results)
 
+@app.route("/analyzeBulk", methods=["POST"])
+def analyze_bulk():
+    """Per-class charts for every uploaded CSV (zips are expanded) plus the merged school charts."""
+    files = [f for f in request.files.getlist("csv_files") if f.filename]
+    if not files:
+        return jsonify({"error": "Upload class CSVs (or a zip of them) as csv_files"}), 400
+    try:
+        with metrics.stage("bulk"):
+            result = BULK_ANALYZER.analyse_uploads(files)
+    except (ValueError, zipfile.BadZipFile) as exc:
+        return jsonify({"error": str(exc)}), 400
+    return jsonify(result)
+
+@app.route("/roster/<class_id>", methods=["GET", "POST", "DELETE"])
+def class_roster(class_id):
+    """
+    GET: the class charts from the stored roster.
+    POST: a delta (csv_file with Student_ID, and/or `remove` IDs, comma separated);
+    only those students are scored, and the charts come from the updated counts.
+    DELETE: drops the roster.
+    """
+    if request.method == "DELETE":
+        return jsonify({"deleted": ROSTER_STORE.delete_class(class_id)})
+
+    if request.method == "POST":
+        file = request.files.get("csv_file")
+        remove = [i.strip() for value in request.values.getlist("remove") for i in value.split(",") if i.strip()]
+        try:
+            with metrics.stage("roster_delta"):
+                result = ROSTER_STORE.apply_delta(class_id, file if file and file.filename else None, remove)
+        except (ValueError, KeyError) as exc:
+            return jsonify({"error": str(exc)}), 400
+    else:
+        result = ROSTER_STORE.summary(class_id)
+    if result is None:
+        return jsonify({"error": f"Unknown class: {class_id}"}), 404
+
+    if result["charts"] is not None:
+        summary = {"type": "batch", "clusters": result["charts"]["academic_distribution"]}
+        attach_insight(result, summary)
+    return jsonify(result)
+
+@app.route("/exportStudents", methods=["POST"])
+def export_students():
+    """
+    Streams one row per student (clusters, exam / predicted score, imputation flag)
+    as NDJSON (default) or CSV (format=csv), while the upload is analysed chunk by chunk.
+    """
+    file = request.files["csv_file"]
+    fmt = (request.values.get("format") or "ndjson").lower()
+
+    # Flask closes request.files when the view returns, before the body is streamed,
+    # so the response reads from its own copy
+    upload = tempfile.TemporaryFile()
+    shutil.copyfileobj(file.stream, upload)
+    upload.seek(0)
+    try:
+        lines = export.export_students(upload, fmt, chunksize=ANALYZE_CHUNK_ROWS or analyze.STREAM_CHUNK_ROWS)
+    except (ValueError, KeyError) as exc:
+        upload.close()
+        return jsonify({"error": str(exc)}), 400
+
+    def body():
+        with upload:
+            yield from lines
+
+    headers = {"X-Accel-Buffering": "no"} # let a proxy pass chunks on as they come
+    if fmt == "csv":
+        name = os.path.splitext(os.path.basename(file.filename or "class"))[0]
+        headers["Content-Disposition"] = f'attachment; filename="{name}-students.csv"'
+    return Response(body(), mimetype=export.FORMATS[fmt], headers=headers)
+
+@app.route("/simulate", methods=["POST"])
+def simulate_student():
+    """
+    JSON body: {"student": {...}, "grid": {feature: values}, "clip": true, "sensitivities": true}.
+    Numeric grid values are offsets from the student's value, categorical ones are levels.
+    Returns the predicted score and both clusters of every scenario, plus per-feature sensitivities.
+    """
+    body = request.get_json(silent=True) or {}
+    if not isinstance(body.get("student"), dict) or not isinstance(body.get("grid", {}), dict):
+        return jsonify({"error": "Send a JSON body with a student object and a grid object"}), 400
+    try:
+        with metrics.stage("simulate"):
+            result = simulate.simulate(body["student"], body.get("grid", {}), clip=body.get("clip", True) is not False,
+                                       max_scenarios=SIMULATE_MAX_SCENARIOS,
+                                       include_sensitivities=body.get("sensitivities", True) is not False)
+    except (ValueError, KeyError, TypeError) as exc:
+        return jsonify({"error": str(exc)}), 400
+    return jsonify(result)
+
 @app.route("/analyzeStudent", methods=["POST"])
 def analyze_student():
     data = request.form.to_dict()
@@ -89,15 +309,43 @@ def analyze_student():
             except ValueError:
                 data[key] = 0.0
 
-    analysis_results = analyze.visualise(data)
+    if STUDENT_COALESCER is not None and not is_warmup():
+        analysis_results = STUDENT_COALESCER.submit(data)
+    else:
+        analysis_results = analyze.visualise(data)
     
     summary = {
         "type": "single",
         "predicted_score": analysis_results.get('score_value', 'N/A'),
         "metrics": data
     }
-    analysis_results['ai_insight'] = get_ai_insight(summary)
+    attach_insight(analysis_results, summary)
     return jsonify(analysis_results)
 
+@app.route("/insight/<job_id>")
+def insight_status(job_id):
+    """Polled by the page until the background AI insight is done."""
+    job = INSIGHT_JOBS.status(job_id)
+    if job is None:
+        return jsonify({"status": "unknown"}), 404
+    return jsonify(job)
+
+@app.route("/stats")
+def stats():
+    """Cache counters (hits, misses, evictions...) for monitoring."""
+    return jsonify({
+        "result_cache": RESULT_CACHE.stats(),
+        "insight_cache": INSIGHT_CACHE.stats(),
+        "insight_jobs": INSIGHT_JOBS.stats(),
+        "gemini_client": GEMINI_CLIENT.stats(),
+        "student_batching": STUDENT_COALESCER.stats() if STUDENT_COALESCER is not None else None,
+        "bulk": BULK_ANALYZER.stats()
+    })
+
+@app.route("/metrics")
+def prometheus_metrics():
+    """Stage latency, rows, upload size and AI call histograms in the Prometheus text format."""
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
     app.run(debug=True)
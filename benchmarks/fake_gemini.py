@@ -0,0 +1,95 @@
+"""
+Local stand-in for the Gemini generateContent API, for load and failure testing.
+
+    python -m benchmarks.fake_gemini --port 8765 --latency 0.3 --burst-every 20 --burst-length 5
+    GEMINI_API_KEY=test GEMINI_API_BASE=http://127.0.0.1:8765/v1beta python app.py
+
+Every `burst_every` requests, the next `burst_length` ones get a 429 (with Retry-After),
+and `error_rate` of the rest get a 503. Tests can force the status of given
+requests with `statuses` ({request number: status}). Counters (requests, connections...) are at GET /stats.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+INSIGHT = "<h3>🎯 Key Observations</h3><ul><li><b>Trend Analysis:</b> Stand-in insight.</li></ul>"
+
+
+def make_server(port=0, latency=0.0, burst_every=0, burst_length=0, error_rate=0.0, retry_after=1,
+                statuses=None):
+    """Builds (but doesn't start) the stand-in server. Port 0 picks a free port."""
+    stats = {"requests": 0, "ok": 0, "rate_limited": 0, "errors": 0, "connections": 0}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1" # keep-alive, so connection reuse is visible in the stats
+
+        def setup(self):
+            super().setup()
+            with lock:
+                stats["connections"] += 1
+
+        def log_message(self, *args):
+            pass
+
+        def _reply(self, status, body, headers=None):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            with lock:
+                self._reply(200, dict(stats))
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            with lock:
+                stats["requests"] += 1
+                n = stats["requests"]
+            time.sleep(latency)
+
+            if statuses and n in statuses:
+                with lock:
+                    stats["errors"] += 1
+                return self._reply(statuses[n], {"error": {"code": statuses[n]}})
+            in_burst = burst_every and (n - 1) % burst_every >= burst_every - burst_length
+            if in_burst:
+                with lock:
+                    stats["rate_limited"] += 1
+                return self._reply(429, {"error": {"code": 429}}, {"Retry-After": str(retry_after)})
+            if random.random() < error_rate:
+                with lock:
+                    stats["errors"] += 1
+                return self._reply(503, {"error": {"code": 503}})
+
+            with lock:
+                stats["ok"] += 1
+            self._reply(200, {"candidates": [{"content": {"parts": [{"text": INSIGHT}]}}]})
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    server.stats = stats
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds per response")
+    parser.add_argument("--burst-every", type=int, default=0, help="a 429 burst every N requests (0 = never)")
+    parser.add_argument("--burst-length", type=int, default=0, help="requests per 429 burst")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of 503 responses")
+    parser.add_argument("--retry-after", type=int, default=1)
+    args = parser.parse_args()
+
+    server = make_server(args.port, args.latency, args.burst_every, args.burst_length,
+                         args.error_rate, args.retry_after)
+    print(f"Fake Gemini listening on http://127.0.0.1:{server.server_address[1]}/v1beta")
+    server.serve_forever()
@@ -0,0 +1,97 @@
+"""
+Where worker startup time goes.
+
+    python -m benchmarks.startup
+    python -m benchmarks.startup --top 25 --out startup.json
+
+Three fresh interpreters, so nothing is cached between them:
+  imports  `python -X importtime -c "import app"`, summed per top-level package
+  cold     import app, then the first /analyzeGroup and /analyzeStudent requests
+  warm     import app, warmup.preload() and warmup.warm_up(), then the same two requests
+The AI is left unconfigured, so no request leaves the process.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in the child process; prints one JSON object of timings
+TIMELINE = r"""
+import io, json, sys, time
+start = time.perf_counter()
+import app
+from utilities import warmup
+timings = {"import app": time.perf_counter() - start}
+
+if sys.argv[1] == "warm":
+    for step, seconds in warmup.preload(freeze=False).items():
+        timings[f"preload: {step}"] = seconds
+    for endpoint, seconds in warmup.warm_up(app.app).items():
+        timings[f"warm-up {endpoint}"] = seconds
+
+csv_bytes, student = warmup.sample_requests()
+client = app.app.test_client()
+for url, data in (("/analyzeGroup", {"csv_file": (io.BytesIO(csv_bytes), "class.csv")}),
+                  ("/analyzeStudent", student)):
+    t = time.perf_counter()
+    assert client.post(url, data=data).status_code == 200
+    timings[f"first {url}"] = time.perf_counter() - t
+print(json.dumps(timings))
+"""
+
+def _env():
+    return dict(os.environ, GEMINI_API_KEY="", ASYNC_INSIGHTS="0", RESULT_CACHE_SIZE="0")
+
+def import_times(top=15):
+    """(total seconds, [(package, seconds)] by self time, [(module, cumulative seconds)] imported by app)."""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app"],
+                          cwd=ROOT, env=_env(), capture_output=True, text=True, check=True)
+    packages, direct, total = {}, [], 0.0
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2 # 1 space after "|", then 2 per level
+        name = name.strip()
+        packages[name.split(".")[0]] = packages.get(name.split(".")[0], 0.0) + int(self_us) / 1e6
+        if name == "app":
+            total = int(cumulative_us) / 1e6
+        elif depth == 1:
+            direct.append((name, int(cumulative_us) / 1e6))
+    by_package = sorted(packages.items(), key=lambda item: -item[1])[:top]
+    return total, by_package, sorted(direct, key=lambda item: -item[1])[:top]
+
+def timeline(mode):
+    proc = subprocess.run([sys.executable, "-c", TIMELINE, mode],
+                          cwd=ROOT, env=_env(), capture_output=True, text=True, check=True)
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+def print_report(report):
+    print(f"import app: {report['import_total'] * 1000:.0f} ms\n")
+    print("Self time per package:")
+    for name, seconds in report["packages"]:
+        print(f"  {name:<28} {seconds * 1000:8.1f} ms")
+    print("\nImported by app (cumulative):")
+    for name, seconds in report["direct"]:
+        print(f"  {name:<28} {seconds * 1000:8.1f} ms")
+    for mode in ("cold", "warm"):
+        print(f"\n{mode}:")
+        for step, seconds in report[mode].items():
+            print(f"  {step:<28} {seconds * 1000:8.1f} ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--out", help="also write the report as JSON")
+    args = parser.parse_args()
+
+    total, packages, direct = import_times(args.top)
+    report = {"import_total": total, "packages": packages, "direct": direct,
+              "cold": timeline("cold"), "warm": timeline("warm")}
+    print_report(report)
+    if args.out:
+        with open(args.out, "w") as file:
+            json.dump(report, file, indent=2)
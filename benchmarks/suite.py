@@ -0,0 +1,314 @@
+"""
+Benchmarks for the analysis pipeline, on synthetic classes (see benchmarks.synthetic).
+
+    python -m benchmarks.suite --sizes 1000 100000 --out bench.json
+    python -m benchmarks.suite --sizes 1000 100000 --save-baseline benchmarks/baseline.json
+    python -m benchmarks.suite --sizes 1000 100000 --baseline benchmarks/baseline.json
+
+Every case runs in its own subprocess so its peak RSS is its own. Batch cases are
+timed per stage (best of --repeat runs), single-student cases per call (p50/p95/p99). The AI call
+is stubbed in the endpoint cases. With --baseline, cases that got slower or bigger
+than the tolerance are listed and the exit code is 1.
+"""
+import argparse
+import hashlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+BATCH_CASES = ["batch_stages", "analysis_full", "analysis_lean", "visualise", "visualise_stream",
+               "predict_batch", "endpoint_group"]
+SINGLE_CASES = ["single_analysis", "single_visualise", "predict_single", "endpoint_student"]
+SINGLE_RECORDS = 1000
+
+STUB_INSIGHT = "<h3>Benchmark</h3><ul><li>Stubbed insight.</li></ul>"
+
+
+class StageTimer:
+    """Accumulates wall time per named stage."""
+
+    def __init__(self):
+        self.stages = {}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far."""
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024 # bytes on macOS, KiB elsewhere
+
+
+# ---- cases (run inside the worker subprocess) ----
+
+def _stub_app():
+    """The Flask app with caching off and Gemini replaced by a constant answer."""
+    os.environ.update(GEMINI_API_KEY="benchmark", ASYNC_INSIGHTS="0", RESULT_CACHE_SIZE="0")
+    import app
+    app.GEMINI_CLIENT.generate = lambda prompt: STUB_INSIGHT
+    return app.app.test_client()
+
+def _batch_case(case, csv_path):
+    """One run of a batch case. Returns {stage: seconds}."""
+    import numpy as np
+    import pandas as pd
+    from utilities import analyze, assignment, encoding, predict_score
+
+    timer = StageTimer()
+    if case == "batch_stages":
+        # The steps of get_complete_analysis / visualise, one by one
+        with timer.stage("read_csv"):
+            df = pd.read_csv(csv_path)
+        with timer.stage("encode"):
+            X = encoding.encode_frame(df)
+        with timer.stage("impute"):
+            is_predicted = 'Exam_Score' not in df.columns or np.isnan(X[:, encoding.EXAM_INDEX]).any()
+            if is_predicted:
+                X[:, encoding.EXAM_INDEX] = analyze._impute_scores(df, X)
+        with timer.stage("assign_academic"):
+            ac_labels = analyze._assign_academics(X)
+        with timer.stage("assign_persona"):
+            pc_labels, _ = analyze._assign_personas(X)
+        with timer.stage("charts"):
+            table = assignment.contingency_table(ac_labels, pc_labels, len(analyze.CENTROID3), len(analyze.CENTROID5))
+            analyze.batch_charts(table, is_predicted)
+    elif case == "analysis_full":
+        with timer.stage("total"):
+            analyze.get_complete_analysis(csv_path, include_mappings=True, include_frames=True)
+    elif case == "analysis_lean":
+        with timer.stage("total"):
+            analyze.get_complete_analysis(csv_path, include_mappings=False, include_frames=False)
+    elif case == "visualise":
+        with timer.stage("total"):
+            analyze.visualise(csv_path)
+    elif case == "visualise_stream":
+        with timer.stage("total"):
+            analyze.visualise(csv_path, chunksize=analyze.STREAM_CHUNK_ROWS)
+    elif case == "predict_batch":
+        with timer.stage("read_csv"):
+            df = pd.read_csv(csv_path)
+        with timer.stage("predict"):
+            predict_score.predict_exam_score(df)
+    elif case == "endpoint_group":
+        client = _stub_app()
+        with open(csv_path, "rb") as file:
+            body = file.read()
+        with timer.stage("total"):
+            response = client.post("/analyzeGroup", data={"csv_file": (io.BytesIO(body), "class.csv")},
+                                   content_type="multipart/form-data")
+        if response.status_code != 200:
+            raise RuntimeError(f"/analyzeGroup answered {response.status_code}")
+    else:
+        raise ValueError(f"Unknown batch case: {case}")
+    return timer.stages
+
+def _single_records(csv_path):
+    """Up to SINGLE_RECORDS students from the CSV, as the dashboard form would send them."""
+    import pandas as pd
+    df = pd.read_csv(csv_path, nrows=SINGLE_RECORDS)
+    df = df.astype(object).where(df.notna(), None)
+    return df.to_dict(orient="records")
+
+def _single_case(case, csv_path):
+    """Per-call seconds of a single-student case over the sampled records."""
+    from utilities import analyze, predict_score
+
+    records = _single_records(csv_path)
+    if case == "single_analysis":
+        call = analyze.get_complete_analysis
+    elif case == "single_visualise":
+        call = analyze.visualise
+    elif case == "predict_single":
+        records = [{k: v for k, v in r.items() if k != 'Exam_Score'} for r in records]
+        call = predict_score.predict_exam_score
+    elif case == "endpoint_student":
+        client = _stub_app()
+        records = [{k: "" if v is None else v for k, v in r.items()} for r in records]
+        call = lambda record: client.post("/analyzeStudent", data=record)
+    else:
+        raise ValueError(f"Unknown single case: {case}")
+
+    call(dict(records[0])) # warm-up: lazy model loading etc.
+    timings = []
+    for record in records:
+        record = dict(record)
+        start = time.perf_counter()
+        call(record)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+def run_worker(case, csv_path, repeat):
+    """Runs one case `repeat` times in this process and returns its measurements."""
+    start_rss = peak_rss_mb() # bare interpreter, before numpy/pandas are imported
+    if case in SINGLE_CASES:
+        import numpy as np
+        timings = []
+        for _ in range(repeat):
+            timings.extend(_single_case(case, csv_path))
+        timings = np.array(timings)
+        result = {
+            "calls": len(timings),
+            "seconds": float(timings.mean()),
+            "p50_us": float(np.percentile(timings, 50) * 1e6),
+            "p95_us": float(np.percentile(timings, 95) * 1e6),
+            "p99_us": float(np.percentile(timings, 99) * 1e6)
+        }
+    else:
+        runs = [_batch_case(case, csv_path) for _ in range(repeat)]
+        totals = [sum(stages.values()) for stages in runs]
+        best = runs[totals.index(min(totals))]
+        result = {"seconds": min(totals), "stages": best}
+    result.update(start_rss_mb=start_rss, peak_rss_mb=peak_rss_mb())
+    return result
+
+
+# ---- driver ----
+
+def class_csv(rows, seed, missing_scores, cache_dir):
+    """Path of a synthetic class CSV, generated once per (rows, seed, missing, source) and reused."""
+    from benchmarks import synthetic
+
+    with open(synthetic.RAW_CSV, "rb") as file:
+        source_hash = hashlib.sha256(file.read()).hexdigest()[:8]
+    path = os.path.join(cache_dir, f"class-{rows}-{seed}-{missing_scores}-{source_hash}.csv")
+    if not os.path.exists(path):
+        os.makedirs(cache_dir, exist_ok=True)
+        print(f"Generating {rows} rows -> {path}", file=sys.stderr)
+        synthetic.generate(rows, path, seed, missing_scores)
+    return path
+
+def run_case(case, csv_path, repeat, timeout):
+    """One case in a fresh interpreter; returns its result dict (or an error)."""
+    command = [sys.executable, "-m", "benchmarks.suite", "--worker", case, "--csv", csv_path, "--repeat", str(repeat)]
+    try:
+        done = subprocess.run(command, cwd=ROOT, capture_output=True, text=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return {"error": f"timed out after {timeout}s"}
+    if done.returncode != 0:
+        return {"error": done.stderr.strip().splitlines()[-1] if done.stderr.strip() else f"exit {done.returncode}"}
+    return json.loads(done.stdout.strip().splitlines()[-1])
+
+def environment():
+    import numpy
+    import pandas
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": numpy.__version__,
+        "pandas": pandas.__version__,
+        "machine": platform.machine(),
+        "cpus": os.cpu_count()
+    }
+
+def compare(results, baseline, tolerance):
+    """Regressions of `results` against `baseline`: slower or bigger than (1 + tolerance)."""
+    previous = {(r["case"], r["rows"]): r for r in baseline["results"] if "error" not in r}
+    regressions = []
+    for result in results:
+        old = previous.get((result["case"], result["rows"]))
+        if old is None or "error" in result:
+            continue
+        # p99 only for single-student cases, and only if the baseline has it too
+        for metric in [m for m in ("seconds", "p99_us", "peak_rss_mb") if m in result and m in old]:
+            ratio = result[metric] / old[metric] if old[metric] else 1.0
+            result.setdefault("vs_baseline", {})[metric] = round(ratio, 3)
+            if ratio > 1 + tolerance:
+                regressions.append(f"{result['case']} @ {result['rows']} rows: {metric} x{ratio:.2f}")
+    return regressions
+
+def print_table(results):
+    print(f"{'case':<18} {'rows':>10} {'seconds':>10} {'rows/s':>12} {'p50 us':>9} {'p95 us':>9} {'p99 us':>9} "
+          f"{'peak MB':>9} {'vs base':>20}")
+    for r in results:
+        if "error" in r:
+            print(f"{r['case']:<18} {r['rows']:>10} ERROR {r['error']}")
+            continue
+        rate = f"{r['rows_per_second']:,.0f}" if "rows_per_second" in r else ""
+        p50, p95, p99 = (f"{r[key]:.0f}" if key in r else "" for key in ("p50_us", "p95_us", "p99_us"))
+        base = r.get("vs_baseline")
+        base = " ".join(f"{prefix}{base[metric]:.2f}" for prefix, metric in
+                        (("t", "seconds"), ("p", "p99_us"), ("m", "peak_rss_mb")) if metric in base) if base else ""
+        print(f"{r['case']:<18} {r['rows']:>10} {r['seconds']:>10.4g} {rate:>12} {p50:>9} {p95:>9} {p99:>9} "
+              f"{r['peak_rss_mb']:>9.1f} {base:>20}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 100000], help="class sizes (rows)")
+    parser.add_argument("--cases", nargs="+", default=BATCH_CASES + SINGLE_CASES, choices=BATCH_CASES + SINGLE_CASES)
+    parser.add_argument("--repeat", type=int, default=3, help="runs per case, the best one is kept")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--missing-scores", type=float, default=0.0, help="fraction of blank Exam_Score cells")
+    parser.add_argument("--cache-dir", default=os.path.join(tempfile.gettempdir(), "student-benchmarks"))
+    parser.add_argument("--timeout", type=float, default=3600, help="seconds per case")
+    parser.add_argument("--out", help="write the results as JSON")
+    parser.add_argument("--baseline", help="results JSON to compare against")
+    parser.add_argument("--save-baseline", help="also write the results to this baseline file")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown / growth vs the baseline")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--csv", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args.worker, args.csv, args.repeat)))
+        return
+
+    results = []
+    single_csv = None
+    for rows in args.sizes:
+        csv_path = class_csv(rows, args.seed, args.missing_scores, args.cache_dir)
+        single_csv = single_csv or csv_path
+        for case in [c for c in args.cases if c in BATCH_CASES]:
+            result = dict(case=case, rows=rows, **run_case(case, csv_path, args.repeat, args.timeout))
+            if "error" not in result and result["seconds"]:
+                result["rows_per_second"] = rows / result["seconds"]
+            results.append(result)
+
+    # Single-student cases don't depend on the class size: one run on the first class
+    for case in [c for c in args.cases if c in SINGLE_CASES]:
+        csv_path = single_csv or class_csv(SINGLE_RECORDS, args.seed, args.missing_scores, args.cache_dir)
+        results.append(dict(case=case, rows=1, **run_case(case, csv_path, args.repeat, args.timeout)))
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(results, json.load(file), args.tolerance)
+
+    print_table(results)
+    report = {"environment": environment(), "settings": {
+        "repeat": args.repeat, "seed": args.seed, "missing_scores": args.missing_scores
+    }, "results": results}
+    for path in filter(None, (args.out, args.save_baseline)):
+        with open(path, "w") as file:
+            json.dump(report, file, indent=2)
+
+    if regressions:
+        print("\nRegressions vs baseline:")
+        for line in regressions:
+            print(f"  {line}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Synthetic class CSVs of any size, sampled from the per-column distributions of data/rawdata.csv.
+
+    python -m benchmarks.synthetic 100000 /tmp/class_100k.csv --seed 1 --missing-scores 0.1
+
+Every column is sampled independently from its observed values (missing ones included),
+so category frequencies and numeric ranges match the real data. Rows are written in
+chunks, so a 10M-row file never has to fit in memory.
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RAW_CSV = os.path.join(ROOT, "data", "rawdata.csv")
+
+
+def column_distributions(source=RAW_CSV):
+    """{column: (values, probabilities)} for every column of the source CSV."""
+    df = pd.read_csv(source)
+    distributions = {}
+    for col in df.columns:
+        counts = df[col].value_counts(dropna=False)
+        distributions[col] = (counts.index.to_numpy(dtype=object), (counts / counts.sum()).to_numpy())
+    return distributions
+
+
+def sample_frame(distributions, n_rows, rng, missing_scores=0.0):
+    """One DataFrame of n_rows sampled rows (Exam_Score blanked with probability missing_scores)."""
+    frame = pd.DataFrame({
+        col: values[rng.choice(len(values), size=n_rows, p=probabilities)]
+        for col, (values, probabilities) in distributions.items()
+    })
+    if missing_scores and 'Exam_Score' in frame.columns:
+        frame.loc[rng.random(n_rows) < missing_scores, 'Exam_Score'] = None
+    return frame
+
+
+def generate(n_rows, path, seed=0, missing_scores=0.0, source=RAW_CSV, chunksize=100000):
+    """Writes an n_rows synthetic class CSV to path and returns the path."""
+    distributions = column_distributions(source)
+    rng = np.random.default_rng(seed)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+
+    written = 0
+    with open(tmp_path, "w", newline="") as file:
+        while True:
+            size = min(chunksize, n_rows - written)
+            sample_frame(distributions, size, rng, missing_scores).to_csv(file, index=False, header=written == 0)
+            written += size
+            if written >= n_rows:
+                break
+    os.replace(tmp_path, path)
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("rows", type=int)
+    parser.add_argument("output")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--missing-scores", type=float, default=0.0, help="fraction of blank Exam_Score cells")
+    parser.add_argument("--source", default=RAW_CSV)
+    args = parser.parse_args()
+
+    generate(args.rows, args.output, args.seed, args.missing_scores, args.source)
+    print(f"Wrote {args.rows} rows to {args.output}")
@@ -38,6 +38,7 @@ def reduce_to_five_themes(input_file, output_file):
     print(f"Successfully reduced 20 attributes to 5 themes. Saved to: {output_file}")
     return reduced_df
 
-# Execute the script
-reduced_data = reduce_to_five_themes('processeddata.csv', '5featuredata.csv')
+if __name__ == "__main__":
+    # Execute the script
+    reduced_data = reduce_to_five_themes('processeddata.csv', '5featuredata.csv')
 
@@ -37,5 +37,6 @@ def map_new_data(input_file, output_file):
     df.to_csv(output_file, index=False)
     return df
 
-# Run the mapping
-map_new_data('rawdata.csv', 'processeddata.csv')
\ No newline at end of file
+if __name__ == "__main__":
+    # Run the mapping
+    map_new_data('rawdata.csv', 'processeddata.csv')
\ No newline at end of file
@@ -0,0 +1,155 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+# Run from anywhere: the utilities package lives in the project root
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from utilities import caching, dataset, encoding, persona, preprocessing
+
+# raw CSV -> encoded -> scaled
+#                    -> themes
+# Every stage calls the exact functions serving uses (encoding.encode_frame,
+# preprocessing.scale_matrix, persona.project_themes), so the training data goes
+# through the same transforms as an upload. Outputs are memory-mapped float32
+# dataset files (utilities/dataset.py) named after a key built from the input's
+# content hash and the constants of the transform; a stage whose key is
+# unchanged is skipped.
+
+ARTIFACT_DIR = os.path.join(ROOT, "data", "artifacts")
+MANIFEST = "manifest.json"
+
+THEME_COLUMNS = list(persona.THEME_MAP) + ['Exam_Score']
+
+# Transforms return (matrix, columns, scaling reference the values went through)
+
+def _encode(df):
+    return encoding.encode_frame(df), encoding.COLUMNS, None
+
+def _scale(X):
+    return preprocessing.scale_matrix(X), encoding.COLUMNS, preprocessing.REFERENCE_DICT
+
+def _themes(X):
+    # Same 5 themes as serving, with the scaled Exam_Score as the last column
+    exam = preprocessing.scale_matrix(X[:, [encoding.EXAM_INDEX]], ['Exam_Score'])
+    return np.hstack([persona.project_themes(X), exam]), THEME_COLUMNS, preprocessing.REFERENCE_DICT
+
+# stage -> (input stage or None for the raw CSV, transform, constants it depends on)
+STAGES = {
+    "encoded": (None, _encode, {
+        "category_maps": encoding.CATEGORY_MAPS, "missing_code": encoding.MISSING_CODE,
+        "columns": encoding.COLUMNS
+    }),
+    "scaled": ("encoded", _scale, {
+        "reference": preprocessing.REFERENCE_DICT, "inverted": preprocessing.INVERTED_COLUMNS
+    }),
+    "themes": ("encoded", _themes, {
+        "reference": preprocessing.REFERENCE_DICT, "inverted": preprocessing.INVERTED_COLUMNS,
+        "theme_map": persona.THEME_MAP
+    })
+}
+
+def file_hash(path):
+    with open(path, "rb") as file:
+        return caching.hash_stream(file)
+
+def stage_key(stage, input_hash):
+    """Changes whenever the input bytes, the serving constants of the stage or the file format change."""
+    constants = json.dumps(STAGES[stage][2], sort_keys=True)
+    return hashlib.sha256(f"{stage}:{input_hash}:{constants}:{dataset.FORMAT_VERSION}".encode()).hexdigest()
+
+def load_manifest(artifact_dir=ARTIFACT_DIR):
+    path = os.path.join(artifact_dir, MANIFEST)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as file:
+        return json.load(file)
+
+def save_manifest(manifest, artifact_dir=ARTIFACT_DIR):
+    path = os.path.join(artifact_dir, MANIFEST)
+    with open(path + ".tmp", "w") as file:
+        json.dump(manifest, file, indent=2)
+    os.replace(path + ".tmp", path)
+
+def stage_path(stage, artifact_dir=ARTIFACT_DIR):
+    """Dataset file of a finished stage, e.g. for the training scripts' --data."""
+    return os.path.join(artifact_dir, load_manifest(artifact_dir)[stage]["file"])
+
+def load_stage(stage, artifact_dir=ARTIFACT_DIR):
+    """(memory-mapped matrix, columns) of a finished stage."""
+    matrix, header = dataset.open_dataset(stage_path(stage, artifact_dir))
+    return matrix, header["columns"]
+
+def run(raw_csv, artifact_dir=ARTIFACT_DIR, force=False):
+    """
+    Brings every stage up to date for `raw_csv`.
+    Returns {stage: "built" | "cached"}.
+    """
+    os.makedirs(artifact_dir, exist_ok=True)
+    manifest = load_manifest(artifact_dir)
+    raw_hash = file_hash(raw_csv)
+    outcome = {}
+    loaded = {} # matrices computed in this run, so later stages don't reload them
+
+    for stage, (source, transform, _) in STAGES.items():
+        input_hash = raw_hash if source is None else manifest[source]["sha256"]
+        key = stage_key(stage, input_hash)
+        entry = manifest.get(stage)
+
+        if not force and entry and entry["key"] == key and os.path.exists(os.path.join(artifact_dir, entry["file"])):
+            outcome[stage] = "cached"
+            continue
+
+        start = time.perf_counter()
+        if source is None:
+            data = pd.read_csv(raw_csv)
+        else:
+            data = loaded[source] if source in loaded else np.array(load_stage(source, artifact_dir)[0])
+        matrix, columns, reference = transform(data)
+
+        name = f"{stage}-{key[:16]}{dataset.EXTENSION}"
+        path = os.path.join(artifact_dir, name)
+        dataset.write_dataset(path, matrix, columns, reference=reference, source_hash=input_hash,
+                              meta={"stage": stage, "key": key})
+
+        if entry and entry["file"] != name and os.path.exists(os.path.join(artifact_dir, entry["file"])):
+            os.remove(os.path.join(artifact_dir, entry["file"]))
+
+        manifest[stage] = {
+            "key": key, "file": name, "columns": columns, "rows": len(matrix),
+            "source": os.path.relpath(raw_csv, ROOT) if source is None else source,
+            "sha256": file_hash(path), "seconds": round(time.perf_counter() - start, 4)
+        }
+        save_manifest(manifest, artifact_dir)
+        loaded[stage] = matrix
+        outcome[stage] = "built"
+
+    return outcome
+
+def export_csv(stage, output_file, artifact_dir=ARTIFACT_DIR):
+    """Writes a stage back out as CSV, for tools that still read text."""
+    matrix, columns = load_stage(stage, artifact_dir)
+    pd.DataFrame(np.asarray(matrix), columns=columns).to_csv(output_file, index=False)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Raw student CSV -> encoded / scaled / themes artifacts.")
+    parser.add_argument("--raw", default=os.path.join(ROOT, "data", "rawdata.csv"))
+    parser.add_argument("--out", default=ARTIFACT_DIR, help="artifact folder")
+    parser.add_argument("--force", action="store_true", help="rebuild every stage")
+    parser.add_argument("--csv", nargs=2, action="append", metavar=("STAGE", "FILE"),
+                        help="also export a stage as CSV (repeatable)")
+    args = parser.parse_args()
+
+    for stage, status in run(args.raw, args.out, args.force).items():
+        entry = load_manifest(args.out)[stage]
+        print(f"{stage:>8}: {status:<6} {entry['rows']} x {len(entry['columns'])} -> {entry['file']}")
+
+    for stage, output_file in args.csv or []:
+        export_csv(stage, output_file, args.out)
+        print(f"Exported {stage} to {output_file}")
@@ -1,6 +1,8 @@
 import pandas as pd
 from sklearn.preprocessing import MinMaxScaler
 import csv
+# Fits its own min/max on the data. dataConversions/pipeline.py scales with the
+# serving REFERENCE_DICT instead, which is what uploads go through.
 def scale(input_file, output_file):
     # 1. Load the numerically mapped data
     df = pd.read_csv(input_file)
@@ -17,5 +19,6 @@ def scale(input_file, output_file):
     scaler = MinMaxScaler()
     df[df.columns] = scaler.fit_transform(df[df.columns])
     df.to_csv(output_file,index=False)
-scale("processeddata.csv","scaleddata.csv")
+if __name__ == "__main__":
+    scale("processeddata.csv","scaleddata.csv")
 
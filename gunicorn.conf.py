@@ -0,0 +1,32 @@
+import os
+
+# Startup for autoscaled hosts (read by gunicorn from the working directory):
+# the master imports the app and preloads models and deferred modules once, then
+# forks, so workers start warm and share those pages copy-on-write. Each worker
+# then sends a warm-up request to both endpoints before it accepts traffic (a
+# failed warm-up is logged and the worker starts cold).
+#
+#   PRELOAD_APP=0  import the app in every worker instead (e.g. for --reload)
+#   WARMUP=0       skip the per-worker warm-up requests
+
+preload_app = os.environ.get("PRELOAD_APP", "1") != "0"
+WARMUP = os.environ.get("WARMUP", "1") != "0"
+
+def when_ready(server):
+    if preload_app:
+        from utilities import warmup
+        timings = warmup.preload()
+        server.log.info("Preloaded in master: %s", timings)
+
+def post_worker_init(worker):
+    if WARMUP:
+        from utilities import warmup
+        try:
+            if not preload_app:
+                warmup.preload(freeze=False)
+            timings = warmup.warm_up(worker.wsgi)
+        except Exception:
+            # e.g. no sample CSV in the image: serve cold rather than stop the arbiter
+            worker.log.exception("Worker %s warm-up failed, starting cold", worker.pid)
+        else:
+            worker.log.info("Worker %s warmed up: %s", worker.pid, timings)
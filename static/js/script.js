@@ -5,6 +5,35 @@ function display_AI_Insights(MODEL_OUTPUT){
   insight_card.style.display="block"
 }
 
+// Latest background insight job per mode, so an older job never overwrites a newer analysis
+let latestInsightJob = {};
+
+// Polls the server until the background AI insight is ready, then displays it
+async function poll_AI_Insights(MODEL_OUTPUT){
+  const type = MODEL_OUTPUT.type
+  const jobId = MODEL_OUTPUT.insight_job
+  latestInsightJob[type] = jobId
+
+  for (let attempt = 0; attempt < 90; attempt++){
+    await new Promise(resolve => setTimeout(resolve, 1000))
+    if (latestInsightJob[type] !== jobId) return
+
+    try {
+      const response = await fetch(`/insight/${jobId}`)
+      if (!response.ok) return
+      const job = await response.json()
+      if (job.status === "done"){
+        if (latestInsightJob[type] === jobId){
+          display_AI_Insights({type: type, ai_insight: job.ai_insight})
+        }
+        return
+      }
+    } catch (err) {
+      console.error("Insight polling failed", err)
+    }
+  }
+}
+
 // Object to store chart instances to prevent overlapping/glitching
 let chartInstances = {};
 
@@ -146,5 +175,10 @@ function render_charts(MODEL_OUTPUT) {
 
     // insights 
     display_AI_Insights(MODEL_OUTPUT)
+    if (MODEL_OUTPUT.insight_job){
+      poll_AI_Insights(MODEL_OUTPUT)
+    } else {
+      latestInsightJob[MODEL_OUTPUT.type] = null
+    }
 }
 
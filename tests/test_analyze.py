@@ -0,0 +1,59 @@
+"""
+Batch analysis: CSV paths and file objects are streamed, DataFrames are encoded
+whole, and both have to give the same result.
+
+    python -m pytest tests
+    python -m unittest discover tests
+"""
+import io
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from utilities import analyze
+
+RAW_DATA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "rawdata.csv")
+
+
+class StreamedInputTest(unittest.TestCase):
+
+    def setUp(self):
+        # An upload without one of Model 3's features; every Exam_Score is given
+        self.df = pd.read_csv(RAW_DATA, nrows=500).drop(columns=["Sleep_Hours"])
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, "upload.csv")
+        self.df.to_csv(self.path, index=False)
+
+    def assert_same_analysis(self, expected, result):
+        self.assertEqual(result["is_predicted"], expected["is_predicted"])
+        np.testing.assert_array_equal(result["academic_labels"], expected["academic_labels"])
+        np.testing.assert_array_equal(result["persona_labels"], expected["persona_labels"])
+
+    def test_missing_feature_column(self):
+        expected = analyze.get_complete_analysis(self.df.copy())
+        self.assertFalse(expected["is_predicted"])
+        self.assert_same_analysis(expected, analyze.get_complete_analysis(self.path))
+        with open(self.path, "rb") as file:
+            self.assert_same_analysis(expected, analyze.get_complete_analysis(file))
+
+        charts = analyze.visualise(self.df.copy())
+        self.assertEqual(analyze.visualise(self.path, chunksize=64), charts)
+
+    def test_missing_feature_column_and_score(self):
+        # Only now is Model 3 needed, and it can't run without Sleep_Hours
+        self.df.loc[len(self.df) - 1, "Exam_Score"] = np.nan
+        self.df.to_csv(self.path, index=False)
+        with self.assertRaises(KeyError):
+            analyze.get_complete_analysis(self.df.copy())
+        with self.assertRaises(KeyError):
+            analyze.get_complete_analysis(self.path)
+        with self.assertRaises(KeyError):
+            analyze.visualise(io.BytesIO(self.df.to_csv(index=False).encode()), chunksize=64)
+
+
+if __name__ == "__main__":
+    unittest.main()
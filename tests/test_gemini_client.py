@@ -0,0 +1,110 @@
+"""
+GeminiClient against the local stand-in server (benchmarks/fake_gemini.py).
+
+    python -m pytest tests
+    python -m unittest discover tests
+"""
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from benchmarks import fake_gemini
+from utilities import gemini_client
+
+
+def _generate_in_process(base_url, bucket_path, calls, results):
+    # Child process: its own client and session, the same bucket file as its siblings
+    client = gemini_client.GeminiClient("test", base_url=base_url, bucket_path=bucket_path,
+                                        rate_per_minute=30, max_wait=0)
+    answers = [client.generate("prompt") for _ in range(calls)]
+    results.put(sum(answer is not None for answer in answers))
+
+
+class FakeGeminiTest(unittest.TestCase):
+
+    def start_server(self, **options):
+        server = fake_gemini.make_server(**options)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return server, f"http://127.0.0.1:{server.server_address[1]}/v1beta"
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.bucket_path = os.path.join(self.tmp.name, "bucket.json")
+
+    def test_bucket_quota_is_shared_across_processes(self):
+        server, base_url = self.start_server()
+        # 30 per minute: a burst of 5 tokens, then one every 2 s
+        context = multiprocessing.get_context("spawn")
+        results = context.Queue()
+        processes = [context.Process(target=_generate_in_process, args=(base_url, self.bucket_path, 5, results))
+                     for _ in range(3)]
+        for process in processes:
+            process.start()
+        answered = sum(results.get(timeout=60) for _ in processes)
+        for process in processes:
+            process.join(timeout=10)
+
+        # 15 calls from 3 processes, one burst between them (+1 if a token refilled meanwhile)
+        self.assertIn(answered, (5, 6))
+        self.assertEqual(server.stats["requests"], answered)
+
+    def test_breaker_opens_during_429_burst_and_recovers(self):
+        # Requests 1-4 answer, 5-6 get a 429, 7-10 answer...
+        server, base_url = self.start_server(burst_every=6, burst_length=2, retry_after=0)
+        client = gemini_client.GeminiClient("test", base_url=base_url, bucket_path=self.bucket_path,
+                                            rate_per_minute=6000, breaker_threshold=2, breaker_cooldown=0.5)
+
+        for _ in range(4):
+            self.assertEqual(client.generate("prompt"), fake_gemini.INSIGHT)
+
+        # Both attempts hit the burst: the breaker opens and the caller gets None (its fallback)
+        self.assertIsNone(client.generate("prompt"))
+        self.assertEqual(client.breaker.state, "open")
+        self.assertIsNone(client.generate("prompt"))
+        self.assertEqual(server.stats["requests"], 6) # short-circuited, upstream not called
+
+        time.sleep(0.6)
+        self.assertEqual(client.generate("prompt"), fake_gemini.INSIGHT) # half-open trial succeeds
+        self.assertEqual(client.breaker.state, "closed")
+
+        stats = client.stats()
+        self.assertEqual((stats["rate_limited"], stats["short_circuited"], stats["ok"]), (2, 1, 5))
+
+    def test_client_error_during_half_open_trial(self):
+        # Request 1 opens the breaker, the trial (request 2) is rejected as a bad request
+        server, base_url = self.start_server(statuses={1: 503, 2: 400})
+        client = gemini_client.GeminiClient("test", base_url=base_url, bucket_path=self.bucket_path,
+                                            rate_per_minute=6000, max_attempts=1,
+                                            breaker_threshold=1, breaker_cooldown=0.3)
+
+        self.assertIsNone(client.generate("prompt"))
+        self.assertEqual(client.breaker.state, "open")
+
+        time.sleep(0.4)
+        self.assertIsNone(client.generate("prompt"))
+        self.assertEqual(client.breaker.state, "half_open")
+        self.assertEqual(client.generate("prompt"), fake_gemini.INSIGHT) # the next trial isn't blocked
+        self.assertEqual(client.breaker.state, "closed")
+        self.assertEqual(server.stats["requests"], 3)
+
+    def test_session_is_reused(self):
+        server, base_url = self.start_server(latency=0.01)
+        client = gemini_client.GeminiClient("test", base_url=base_url, bucket_path=self.bucket_path,
+                                            rate_per_minute=6000)
+        session = client.session
+        for _ in range(10):
+            self.assertEqual(client.generate("prompt"), fake_gemini.INSIGHT)
+
+        self.assertIs(client.session, session)
+        self.assertEqual(server.stats["requests"], 10)
+        self.assertEqual(server.stats["connections"], 1) # one keep-alive connection for every call
+
+
+if __name__ == "__main__":
+    unittest.main()
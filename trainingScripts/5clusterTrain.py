@@ -1,77 +1,47 @@
-import pandas as pd
-import random
-import numpy as np
-from math import sqrt 
-
-centroiddict={}
-clustered_data={}
-difference={}
-infinity=float('inf')
-
-def calcdistance(x,y):
-    return sqrt(np.sum((x - y) ** 2))
-
-def findingrandomcentroids(no, datapoints):
-    global centroiddict, clustered_data, difference
-    datapoints = np.array(datapoints)
-    
-    # Initialize centroids using K-Means++ logic
-    centroiddict['cluster1'] = datapoints[random.randint(0, len(datapoints)-1)]
-    clustered_data['cluster1'] = []
-    difference['cluster1'] = 0
-
-    for i in range(2, no + 1):
-        distances = np.array([min(np.sum((x - c)**2) for c in centroiddict.values()) for x in datapoints]) 
-        prob = distances / distances.sum()
-        idx = np.random.choice(len(datapoints), p=prob)
-        centroiddict[f'cluster{i}'] = datapoints[idx]
-        clustered_data[f'cluster{i}'] = []
-        difference[f'cluster{i}'] = 0
+import argparse
+import os
+import sys
 
-def clustering(precision, data_points_set):
-    tocontinue = True
-    while tocontinue:
-        # Reset clusters
-        for cluster in clustered_data:
-            clustered_data[cluster] = []
-            
-        # Assignment step
-        for datapoint in data_points_set:
-            best = None
-            mindistance = infinity
-            for cluster in centroiddict:
-                distance = calcdistance(datapoint, centroiddict[cluster])
-                if distance < mindistance:
-                    mindistance = distance
-                    best = cluster
-            clustered_data[best].append(datapoint)
-
-        # Update step
-        for cluster in centroiddict:
-            arr = np.array(clustered_data[cluster])
-            if len(arr) == 0:
-                continue
-            newcentroid = np.mean(arr, axis=0)
-            difference[cluster] = calcdistance(newcentroid, centroiddict[cluster])
-            centroiddict[cluster] = newcentroid
-            
-        if max(difference.values()) < precision:
-            tocontinue = False
-
-# 1. Load data and drop target 'Exam_Score' to cluster on 5 behavioral features
-df = pd.read_csv("5featuredata.csv")
-data_to_cluster = df.drop(columns=['Exam_Score']).to_numpy()
-
-# 2. Run training
-findingrandomcentroids(5, data_to_cluster)
-clustering(10**-10, data_to_cluster)
-
-# 3. Output results
-print("Final Centroids (5 Themes):")
-columns = df.drop(columns=['Exam_Score']).columns
-centroid_df = pd.DataFrame(centroiddict).T
-centroid_df.columns = columns
-with open("results.txt","w") as file:
-    file.write(str(centroiddict))
+import pandas as pd
 
-print(centroid_df)
\ No newline at end of file
+# Run from anywhere: the utilities package lives in the project root
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from utilities import dataset, kmeans, persona
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the 5-cluster behavioural persona model.")
+    parser.add_argument("--data", default=os.path.join(ROOT, "data", "5featuredata.csv"),
+                        help="CSV or memory-mapped dataset file (utilities/dataset.py)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--max-iter", type=int, default=300)
+    parser.add_argument("--tol", type=float, default=1e-10)
+    parser.add_argument("--dry-run", action="store_true", help="print the centroids without saving them")
+    args = parser.parse_args()
+
+    # 1. Load the 5 behavioral features (in centroid order; a dataset file is memory-mapped, not parsed)
+    themes = list(persona.THEME_MAP)
+    data_to_cluster = dataset.load_matrix(args.data, themes)
+
+    # 2. Run training
+    result = kmeans.fit(data_to_cluster, 5, max_iter=args.max_iter, tol=args.tol, seed=args.seed)
+
+    # 3. Keep the existing persona names on the matching centroids
+    clusters = kmeans.name_clusters(result["centroids"], kmeans.load_centroids("persona"))
+
+    # 4. Output results
+    print(f"Final Centroids (5 Themes), {result['n_iter']} iterations, inertia {result['inertia']:.4f}:")
+    print(pd.DataFrame(clusters, index=themes).T)
+
+    if not args.dry_run:
+        meta = {"seed": args.seed, "inertia": result["inertia"], "n_iter": result["n_iter"], "rows": len(data_to_cluster)}
+        entry = kmeans.save_centroids("persona", clusters, themes, meta)
+        print(f"Saved {entry['version']} to {kmeans.CENTROIDS_PATH}")
+
+        with open(os.path.join(ROOT, "results.txt"), "a") as file:
+            file.write('\n')
+            file.write('--------------5 cluster model-------------\n')
+            file.write(str(clusters))
+
+if __name__ == "__main__":
+    main()
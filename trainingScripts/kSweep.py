@@ -0,0 +1,134 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# Run from anywhere: the utilities package lives in the project root
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from utilities import academics, assignment, dataset, kmeans, persona
+
+MODELS = {
+    "academic": (os.path.join(ROOT, "data", "scaleddata.csv"), academics.ACADEMIC_COLS),
+    "persona": (os.path.join(ROOT, "data", "5featuredata.csv"), list(persona.THEME_MAP))
+}
+
+# Feature matrix of the worker process: a view on the parent's shared memory block
+_X = None
+_shm = None
+
+def _attach(name, shape):
+    global _X, _shm
+    _shm = shared_memory.SharedMemory(name=name)
+    _X = np.ndarray(shape, dtype=np.float64, buffer=_shm.buf, order="F")
+
+def _run(task):
+    """One (K, seed) restart on the shared matrix. Only the small result travels back."""
+    k, seed, max_iter, tol = task
+    result = kmeans.fit(_X, k, max_iter=max_iter, tol=tol, seed=seed)
+    return k, seed, result["inertia"], result["n_iter"], result["converged"], result["centroids"]
+
+def sweep(X, ks, n_init, seed=42, max_iter=300, tol=1e-10, workers=None):
+    """
+    Runs every K in `ks` n_init times (distinct seeds) across a process pool.
+    The matrix is copied once into shared memory and every worker maps it, so no
+    task pickles the data. Returns {K: best-inertia run} plus all inertias per K.
+    """
+    seeds = np.random.SeedSequence(seed).generate_state(len(ks) * n_init).tolist()
+    tasks = [(k, seeds[i * n_init + r], max_iter, tol) for i, k in enumerate(ks) for r in range(n_init)]
+    workers = workers or os.cpu_count() or 1
+
+    if workers == 1:
+        global _X
+        _X = X
+        results = list(map(_run, tasks))
+    else:
+        shm = shared_memory.SharedMemory(create=True, size=X.nbytes)
+        try:
+            np.ndarray(X.shape, dtype=np.float64, buffer=shm.buf, order="F")[:] = X
+            with ProcessPoolExecutor(max_workers=workers, initializer=_attach,
+                                     initargs=(shm.name, X.shape)) as pool:
+                # Largest K first so the slowest tasks don't end up last
+                order = sorted(range(len(tasks)), key=lambda i: -tasks[i][0])
+                done = dict(zip(order, pool.map(_run, [tasks[i] for i in order], chunksize=1)))
+                results = [done[i] for i in range(len(tasks))]
+        finally:
+            shm.close()
+            shm.unlink()
+
+    best = {}
+    inertias = {k: [] for k in ks}
+    for k, run_seed, inertia, n_iter, converged, centroids in results:
+        inertias[k].append(inertia)
+        if k not in best or inertia < best[k]["inertia"]:
+            best[k] = {"seed": run_seed, "inertia": inertia, "n_iter": n_iter,
+                       "converged": converged, "centroids": centroids}
+    return best, inertias
+
+def main():
+    parser = argparse.ArgumentParser(description="K x n_init k-means sweep (elbow + silhouette).")
+    parser.add_argument("--model", choices=sorted(MODELS), default="persona")
+    parser.add_argument("--data", help="CSV or dataset file to cluster (defaults to the model's training data)")
+    parser.add_argument("--k-min", type=int, default=2)
+    parser.add_argument("--k-max", type=int, default=10)
+    parser.add_argument("--n-init", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--max-iter", type=int, default=300)
+    parser.add_argument("--tol", type=float, default=1e-10)
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: all cores)")
+    parser.add_argument("--sample", type=int, default=2000, help="rows used for the silhouette score")
+    parser.add_argument("--out", help="write the full report as JSON")
+    parser.add_argument("--save", type=int, metavar="K", help="store the best centroids for K in models/centroids.json")
+    args = parser.parse_args()
+
+    # 1. Load the features of the chosen model
+    default_path, features = MODELS[args.model]
+    # Column-major float64, the layout kmeans.fit works in, so neither the pool nor fit copies it
+    X = np.asfortranarray(dataset.load_matrix(args.data or default_path, features), dtype=np.float64)
+    ks = list(range(args.k_min, args.k_max + 1))
+
+    # 2. Sweep
+    start = time.perf_counter()
+    best, inertias = sweep(X, ks, args.n_init, args.seed, args.max_iter, args.tol, args.workers)
+    elapsed = time.perf_counter() - start
+
+    # 3. Score the best run of every K
+    print(f"{args.model}: {len(X)} rows, K={ks[0]}..{ks[-1]} x {args.n_init} restarts in {elapsed:.2f}s")
+    print(f"{'K':>3} {'inertia':>12} {'spread':>10} {'silhouette':>11} {'iters':>6}")
+    report = {"model": args.model, "features": features, "n_init": args.n_init, "seed": args.seed,
+              "seconds": round(elapsed, 3), "results": []}
+    for k in ks:
+        run = best[k]
+        labels, _ = assignment.nearest_centroid(X, run["centroids"])
+        silhouette = kmeans.silhouette_score(X, labels, args.sample, seed=args.seed)
+        spread = max(inertias[k]) - min(inertias[k])
+        print(f"{k:>3} {run['inertia']:>12.4f} {spread:>10.4f} {silhouette:>11.4f} {run['n_iter']:>6}")
+        report["results"].append({
+            "k": k, "inertia": run["inertia"], "inertia_spread": spread, "silhouette": silhouette,
+            "seed": run["seed"], "n_iter": run["n_iter"], "converged": run["converged"],
+            "centroids": run["centroids"].tolist()
+        })
+
+    if args.out:
+        with open(args.out, "w") as file:
+            json.dump(report, file, indent=2)
+        print(f"Report written to {args.out}")
+
+    # 4. Optionally promote one K, keeping the existing cluster names where they match
+    if args.save is not None:
+        if args.save not in best:
+            parser.error(f"--save {args.save} is outside the swept range")
+        run = best[args.save]
+        clusters = kmeans.name_clusters(run["centroids"], kmeans.load_centroids(args.model))
+        meta = {"seed": run["seed"], "inertia": run["inertia"], "n_iter": run["n_iter"],
+                "rows": len(X), "n_init": args.n_init}
+        entry = kmeans.save_centroids(args.model, clusters, features, meta)
+        print(f"Saved {entry['version']} to {kmeans.CENTROIDS_PATH}")
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,6 @@
+import os
+import sys
+import numpy as np
 import pandas as pd
 import joblib # Added for saving the model
 from sklearn.model_selection import train_test_split
@@ -5,8 +8,13 @@ from sklearn.preprocessing import MinMaxScaler # Changed from StandardScaler
 from sklearn.linear_model import LinearRegression
 from sklearn.metrics import r2_score, mean_absolute_error, mean_squared_error
 
+# Paths are resolved from the project root, which also makes the utilities package importable
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from utilities import predict_score
+
 # 1. Load data
-df = pd.read_csv("data/unscalednumericdata.csv")
+df = pd.read_csv(os.path.join(ROOT, "data", "unscalednumericdata.csv"))
 
 # 2. Split features and target
 TARGET_COL = "Exam_Score"
@@ -31,11 +39,14 @@ model.fit(X_train_scaled, y_train)
 y_pred = model.predict(X_test_scaled)
 print(f"R2 Score: {r2_score(y_test, y_pred)}")
 print(f"Mean Absolute Error: {mean_absolute_error(y_test, y_pred)}")
-print("Root Mean Squared Error      :", mean_squared_error(y_test, y_pred, squared=False))
+print("Root Mean Squared Error      :", np.sqrt(mean_squared_error(y_test, y_pred)))
 # 7. SAVE FOR DASHBOARD (Important!)
 # Create a 'models' folder in your directory first
-joblib.dump(model, 'models/regression_model.pkl')
-joblib.dump(scaler, 'models/regression_scaler.pkl')
+joblib.dump(model, os.path.join(ROOT, "models", "regression_model.pkl"))
+joblib.dump(scaler, os.path.join(ROOT, "models", "regression_scaler.pkl"))
+
+# 8. Compiled artifact for serving: scaler folded into the weights, NumPy-only loading
+artifact = predict_score.export_linear_model(model, scaler)
 
-print("Success: Model and Min-Max Scaler saved to /models folder.")
+print(f"Success: Model and Min-Max Scaler saved to /models folder ({artifact['version']}).")
 
@@ -1,5 +1,22 @@
-from .preprocessing import scale_csv_file, scale_single_record
-from .persona import reduce_dataframe, reduce_record,predict_pc
-from .academics import pick2rec,predict_ac  
-from .predict_score import predict_exam_score,load_regression_assets
-from .analyze import get_complete_analysis,visualise
\ No newline at end of file
+# Public helpers, imported on first use (PEP 562): `from utilities import metrics`
+# only loads metrics, not the whole analysis stack.
+_EXPORTS = {
+    "scale_csv_file": "preprocessing", "scale_single_record": "preprocessing",
+    "reduce_dataframe": "persona", "reduce_record": "persona", "predict_pc": "persona",
+    "pick2rec": "academics", "predict_ac": "academics",
+    "predict_exam_score": "predict_score", "load_regression_assets": "predict_score",
+    "get_complete_analysis": "analyze", "visualise": "analyze"
+}
+
+__all__ = list(_EXPORTS)
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    import importlib
+    value = getattr(importlib.import_module(f".{_EXPORTS[name]}", __name__), name)
+    globals()[name] = value # later lookups skip __getattr__
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
@@ -1,5 +1,11 @@
-import pandas as pd
-from math import sqrt
+try:
+    from . import assignment
+except ImportError:
+    import assignment
+
+# Column order must match the CENTROID3 training order
+ACADEMIC_COLS = ['Exam_Score', 'Previous_Scores']
+
 def pick2rec(input_data):
     """
     Extracts 'Exam_Score' and 'Previous_Scores' for the 3-cluster model.
@@ -7,7 +13,8 @@ def pick2rec(input_data):
     1. A pandas DataFrame (from a CSV)
     2. A single student dictionary (from a dashboard form)
     """
-    cols = ['Exam_Score', 'Previous_Scores']
+    import pandas as pd
+    cols = ACADEMIC_COLS
     
     # Case 1: Input is a DataFrame (Full CSV)
     if isinstance(input_data, pd.DataFrame):
@@ -30,30 +37,21 @@ def pick2rec(input_data):
     else:
         raise TypeError("Input must be a pandas DataFrame or a dictionary.")
 
-def predict_ac(data3, centroids):
-    # 1. Initialize output dictionary
-    prediction_map = {cluster: [] for cluster in centroids.keys()}
-    
-    def calcdistance(x, y):
-        # Euclidean distance formula
-        return sqrt(sum((a - b) ** 2 for a, b in zip(x, y)))
+def assign_ac(data3, centroids):
+    """
+    Vectorized academic assignment.
+    Accepts the pick2rec DataFrame or an (n, 2) array in ACADEMIC_COLS order.
+    Returns (labels, distances) where labels index into the centroid order.
+    """
+    import pandas as pd
+    _, table = assignment.centroid_table(centroids)
+    if isinstance(data3, pd.DataFrame):
+        data3 = data3[ACADEMIC_COLS].to_numpy(dtype=float)
+    points = data3
+    return assignment.nearest_centroid(points, table)
 
-    # 2. Iterate through the dataframe by index
-    for index, row in data3.iterrows():
-        point = [row['Exam_Score'], row['Previous_Scores']]
-        
-        best_cluster = None
-        min_dist = float('inf')
-        
-        # 3. Find the closest centroid
-        for cluster_name, centroid_coords in centroids.items():
-            dist = calcdistance(point, centroid_coords)
-            if dist < min_dist:
-                min_dist = dist
-                best_cluster = cluster_name
-        
-        # 4. Store the index (e.g., if it's record 13, index is 12)
-        prediction_map[best_cluster].append(index)
-        
-    return prediction_map
-    # returns a dictionary
\ No newline at end of file
+def predict_ac(data3, centroids):
+    # Map each cluster name to the indices of its students
+    labels, _ = assign_ac(data3, centroids)
+    return assignment.labels_to_map(labels, list(centroids.keys()), data3.index)
+    # returns a dictionary
@@ -1,29 +1,41 @@
 
-import pandas as pd
-from math import sqrt
-import os
+import numpy as np
 import json
+import hashlib
 
 try:
     from . import preprocessing
     from . import academics
     from . import persona
     from . import predict_score
+    from . import assignment
+    from . import encoding
+    from . import kmeans
+    from . import cluster
+    from . import metrics
 except ImportError:
     import preprocessing
     import academics
     import persona
     import predict_score
+    import assignment
+    import encoding
+    import kmeans
+    import cluster
+    import metrics
+
+# Centroids come from models/centroids.json (written by the training scripts).
+# The tables below are the fallback when that artifact is missing.
 
 # 3-cluster model centroids (Academic Performance)
-CENTROID3 = {
+DEFAULT_CENTROID3 = {
     'Steady Progress Students': [0.26407826, 0.4980978], # Yellow (Baseline)
     'Highly Improved Students': [0.28523119, 0.83384127], # Green (High Growth)
     'Declining Students': [0.24843434, 0.16748274]  # Red (Critical)
 }
 
 # 5-cluster model centroids (Behavioural Personas)
-CENTROID5 = {
+DEFAULT_CENTROID5 = {
     'cluster1': [0.48434735, 0.51876055, 0.35172773, 0.32871612, 0.69163936], 
     'cluster2': [0.47051680, 0.51762281, 0.72973323, 0.31982215, 0.69597686], 
     'cluster3': [0.47009039, 0.51307385, 0.73488024, 0.67072522, 0.73466401], 
@@ -31,11 +43,274 @@ CENTROID5 = {
     'cluster5': [0.48512111, 0.51239632, 0.34586241, 0.32626084, 0.23126512]
 }
 
-def get_complete_analysis(data):
+CENTROID3 = kmeans.load_centroids("academic") or DEFAULT_CENTROID3
+CENTROID5 = kmeans.load_centroids("persona") or DEFAULT_CENTROID5
+
+def pipeline_version():
+    """
+    Identifies everything that shapes an analysis result: the Model 3 artifact
+    and both centroid tables. Used to invalidate cached results on redeploy.
+    """
+    centroids = json.dumps([CENTROID3, CENTROID5], sort_keys=True)
+    centroid_hash = hashlib.sha256(centroids.encode()).hexdigest()[:12]
+    return f"{predict_score.model_version()}/centroids-{centroid_hash}"
+
+# Rows per chunk when an upload is analysed in streaming mode
+STREAM_CHUNK_ROWS = 50000
+
+def _impute_scores(df, X):
+    """Model 3 predictions for every row of an encoded batch."""
+    missing = encoding.missing_columns(df)
+    if missing:
+        raise KeyError(f"Missing model features: {missing}")
+    with metrics.stage("impute"):
+        return predict_score.predict_matrix(X[:, :len(encoding.FEATURE_ORDER)])
+
+# Academic columns an upload must have: Exam_Score can be predicted, Previous_Scores can't
+REQUIRED_ACADEMIC_COLS = [c for c in academics.ACADEMIC_COLS if c != 'Exam_Score']
+
+# Academic label of a row that can't be placed (see _assign_academics with allow_missing)
+NO_LABEL = -1
+
+def _check_academic_columns(df):
+    missing = encoding.missing_columns(df, REQUIRED_ACADEMIC_COLS)
+    if missing:
+        raise KeyError(f"Missing academic columns in DataFrame: {missing}")
+
+def _academic_points(X, allow_missing=False):
+    """
+    Scaled (n, 2) academic matrix; only the 2 academic columns of X get scaled.
+    A row without Previous_Scores, or whose score Model 3 couldn't predict, has a
+    NaN coordinate: ValueError, unless allow_missing.
+    """
+    cols = [encoding.COLUMN_INDEX[c] for c in academics.ACADEMIC_COLS]
+    with metrics.stage("scale"):
+        points = preprocessing.scale_matrix(X[:, cols], academics.ACADEMIC_COLS)
+    if not allow_missing:
+        unplaced = int(np.isnan(points).any(axis=1).sum())
+        if unplaced:
+            raise ValueError(f"{unplaced} rows have no Previous_Scores or no usable Exam_Score")
+    return points
+
+def _assign_academics(X, allow_missing=False):
+    """Academic labels from an encoded matrix (NO_LABEL for rows without a point, with allow_missing)."""
+    points = _academic_points(X, allow_missing)
+    with metrics.stage("assign_academic"):
+        if not allow_missing:
+            ac_labels, _ = academics.assign_ac(points, CENTROID3)
+            return ac_labels
+        complete = ~np.isnan(points).any(axis=1)
+        ac_labels = np.full(len(points), NO_LABEL, dtype=assignment.label_dtype(len(CENTROID3)))
+        ac_labels[complete] = academics.assign_ac(points[complete], CENTROID3)[0]
+    return ac_labels
+
+def _assign_personas(X):
+    """Persona labels plus the 5-theme matrix, projected straight from the encoded matrix."""
+    with metrics.stage("reduce_themes"):
+        reduced = persona.project_themes(X)
+    with metrics.stage("assign_persona"):
+        pc_labels, _ = persona.assign_pc(reduced, CENTROID5)
+    return pc_labels, reduced
+
+def _stream_labels(data, chunksize=STREAM_CHUNK_ROWS):
+    """
+    Reads a CSV path or file-like object `chunksize` rows at a time and yields, per chunk,
+    (persona labels, academic labels on the given scores, academic labels on Model 3 scores, is_predicted).
+
+    The in-memory path re-predicts every score as soon as one is missing, which
+    we only know at the end. So until then both academic versions are computed;
+    once a missing score was seen the given version is None. The Model 3 version
+    is None for a chunk Model 3 can't score (a feature column or value missing):
+    that's only an error if the predictions end up being used.
+    """
+    exam = encoding.EXAM_INDEX
+    is_predicted = False
+    unpredicted = None # why an earlier chunk couldn't be scored
+    rows = 0
+
+    reader = encoding.read_csv(data, chunksize=chunksize)
+    while True:
+        with metrics.stage("read_csv"):
+            chunk = next(reader, None)
+        if chunk is None:
+            break
+        rows += len(chunk)
+
+        _check_academic_columns(chunk)
+        with metrics.stage("encode"):
+            X = encoding.encode_frame(chunk)
+        if 'Exam_Score' not in chunk.columns or np.isnan(X[:, exam]).any():
+            is_predicted = True
+
+        pc_labels, _ = _assign_personas(X)
+        given_labels = None if is_predicted else _assign_academics(X)
+
+        # Personas don't depend on Exam_Score, only the academic side is redone
+        missing = encoding.missing_columns(chunk)
+        if is_predicted:
+            if unpredicted is not None:
+                raise unpredicted
+            X[:, exam] = _impute_scores(chunk, X)
+            imputed_labels = _assign_academics(X)
+        elif missing:
+            # Like the in-memory path, scores that are all given don't need every feature
+            imputed_labels = None
+            unpredicted = unpredicted or KeyError(f"Missing model features: {missing}")
+        else:
+            X[:, exam] = _impute_scores(chunk, X)
+            imputed_labels = _assign_academics(X, allow_missing=True)
+            if (imputed_labels == NO_LABEL).any():
+                imputed_labels = None
+                unpredicted = unpredicted or ValueError(
+                    "Model 3 couldn't predict the score of some rows (missing feature values)")
+        yield pc_labels, given_labels, imputed_labels, is_predicted
+
+    metrics.observe("rows_processed", rows)
+
+def stream_analysis(data, chunksize=STREAM_CHUNK_ROWS):
+    """
+    Batch analysis of a CSV path or file-like object, read `chunksize` rows at a time.
+    Only the running contingency table is kept, so memory stays bounded by the
+    chunk size, and the result matches get_complete_analysis on the whole file.
+    """
+    n_ac, n_pc = len(CENTROID3), len(CENTROID5)
+    given_table = np.zeros((n_ac, n_pc), dtype=np.int64)
+    imputed_table = np.zeros((n_ac, n_pc), dtype=np.int64)
+    is_predicted = False
+
+    for pc_labels, given_labels, imputed_labels, is_predicted in _stream_labels(data, chunksize):
+        with metrics.stage("crosstab"):
+            if given_labels is not None:
+                given_table += assignment.contingency_table(given_labels, pc_labels, n_ac, n_pc)
+            if imputed_labels is not None:
+                imputed_table += assignment.contingency_table(imputed_labels, pc_labels, n_ac, n_pc)
+
+    return {
+        "mode": "batch",
+        "is_predicted": is_predicted,
+        "table": imputed_table if is_predicted else given_table
+    }
+
+def _streamed_labels(data, chunksize=STREAM_CHUNK_ROWS):
+    """
+    (academic labels, persona labels, is_predicted) for a whole CSV, built chunk by
+    chunk: only the int8 label arrays grow with the upload, never a frame or matrix.
+    """
+    pc_parts, given_parts, imputed_parts = [], [], []
+    is_predicted = False
+    for pc_labels, given_labels, imputed_labels, is_predicted in _stream_labels(data, chunksize):
+        pc_parts.append(pc_labels)
+        given_parts.append(given_labels)
+        imputed_parts.append(imputed_labels)
+
+    ac_parts = imputed_parts if is_predicted else given_parts
+    ac_labels = np.concatenate(ac_parts) if ac_parts else np.empty(0, dtype=assignment.label_dtype(len(CENTROID3)))
+    pc_labels = np.concatenate(pc_parts) if pc_parts else np.empty(0, dtype=assignment.label_dtype(len(CENTROID5)))
+    return ac_labels, pc_labels, is_predicted
+
+# Optional identifier column carried through to per-student exports
+ID_COLUMN = 'Student_ID'
+
+def stream_students(data, chunksize=STREAM_CHUNK_ROWS):
+    """
+    Per-student results for a CSV path or file-like object, read `chunksize` rows at a time.
+    Yields one dict of aligned arrays per chunk: row (position in the file), id
+    (ID_COLUMN values or None), academic / persona labels, exam_score, predicted_score
+    and score_imputed.
+
+    Unlike the aggregate path, which re-predicts every score once any is missing,
+    only the missing scores are replaced here: a row's output never depends on
+    rows further down the file. A row that can't be placed academically (no
+    Previous_Scores, or no score and features Model 3 can't use) gets NO_LABEL.
+    """
+    exam = encoding.EXAM_INDEX
+    rows = 0
+
+    reader = encoding.read_csv(data, dtype={ID_COLUMN: str}, chunksize=chunksize)
+    while True:
+        with metrics.stage("read_csv"):
+            chunk = next(reader, None)
+        if chunk is None:
+            break
+
+        _check_academic_columns(chunk)
+        with metrics.stage("encode"):
+            X = encoding.encode_frame(chunk)
+        predicted = _impute_scores(chunk, X)
+        imputed = np.isnan(X[:, exam])
+        X[imputed, exam] = predicted[imputed]
+
+        pc_labels, _ = _assign_personas(X)
+        yield {
+            "row": np.arange(rows, rows + len(chunk)),
+            "id": chunk[ID_COLUMN].to_numpy() if ID_COLUMN in chunk.columns else None,
+            "academic": _assign_academics(X, allow_missing=True),
+            "persona": pc_labels,
+            "exam_score": X[:, exam],
+            "predicted_score": predicted,
+            "score_imputed": imputed
+        }
+        rows += len(chunk)
+
+    metrics.observe("rows_processed", rows)
+
+def label_students(X):
+    """
+    Per-student labels of an encoded matrix, for callers that store them (see roster.py):
+    persona, academic label on the given Exam_Score (NO_LABEL where has_score is False),
+    academic label on Model 3's score, the prediction itself and has_score.
+    """
+    exam = encoding.EXAM_INDEX
+    has_score = ~np.isnan(X[:, exam])
+    pc_labels, _ = _assign_personas(X)
+    given_labels = _assign_academics(X, allow_missing=True)
+
+    with metrics.stage("impute"):
+        predicted = predict_score.predict_matrix(X[:, :len(encoding.FEATURE_ORDER)])
+    scored = X.copy()
+    scored[:, exam] = predicted
+    return {
+        "persona": pc_labels,
+        "academic_given": given_labels,
+        "academic_imputed": _assign_academics(scored),
+        "predicted": predicted,
+        "has_score": has_score
+    }
+
+def _encode_batch(data):
+    """
+    Reads a batch (CSV path, file-like object or DataFrame) into one encoded
+    float32 matrix, with Model 3 filling Exam_Score when any score is missing.
+    Returns (df, X, is_predicted).
+    """
+    with metrics.stage("read_csv"):
+        if isinstance(data, str) or hasattr(data, 'read'):
+            # Path or file-like object, parsed straight into compact dtypes
+            df = encoding.read_csv(data)
+        else:
+            df = data # only read, never modified
+    metrics.observe("rows_processed", len(df))
+    _check_academic_columns(df)
+
+    # One encoded float32 matrix feeds Model 3, the scaling and the themes
+    with metrics.stage("encode"):
+        X = encoding.encode_frame(df)
+
+    is_predicted = False
+    if 'Exam_Score' not in df.columns or np.isnan(X[:, encoding.EXAM_INDEX]).any():
+        X[:, encoding.EXAM_INDEX] = _impute_scores(df, X)
+        is_predicted = True
+    return df, X, is_predicted
+
+def get_complete_analysis(data, include_mappings=False, include_frames=False):
     """
     Coordination logic to get predictions and cluster assignments.
+    Batch results always carry the aligned (int8) label arrays. The large
+    intermediates are opt-in: the {cluster: [indices]} mappings with
+    include_mappings, the scaled float32 full_df / reduced_df frames with include_frames.
     """
     if isinstance(data, dict):
+        # Single student: plain-Python fast path, no pandas or sklearn per request
         raw_record = data.copy()
         is_predicted = False
         
@@ -59,106 +334,253 @@ def get_complete_analysis(data):
 
     else:
         # Batch behavior remains as it is (Phase 1 group analysis)
-        if isinstance(data, str):
-            df = pd.read_csv(data)
-        elif hasattr(data, 'read'):
-        # If it has a 'read' method, it's a file-like object
-            df = pd.read_csv(data)
-            is_batch = True
+        import pandas as pd # Deferred: the single-student path never needs pandas
+        if not include_frames and (isinstance(data, str) or hasattr(data, 'read')):
+            # Labels only: the upload is read in chunks and never held whole
+            ac_labels, pc_labels, is_predicted = _streamed_labels(data)
+            index = pd.RangeIndex(len(ac_labels))
         else:
-            df = data.copy()
+            df, X, is_predicted = _encode_batch(data)
+            index = df.index
+            del df # the parsed upload can be freed as soon as it is encoded
 
-        is_predicted = False
-        if 'Exam_Score' not in df.columns or df['Exam_Score'].isnull().any():
-            df['Exam_Score'] = predict_score.predict_exam_score(df)
-            is_predicted = True
-            
-        processed_df = preprocessing.scale_csv_file(df)
-        
-        data3_df = academics.pick2rec(processed_df)
-        ac_map = academics.predict_ac(data3_df, CENTROID3)
-        
-        data5_df = persona.reduce_dataframe(processed_df)
-        pc_map = persona.predict_pc(data5_df, CENTROID5)
-        
-        return {
+            ac_labels = _assign_academics(X)
+            pc_labels, reduced = _assign_personas(X)
+
+        result = {
             "mode": "batch",
             "is_predicted": is_predicted,
-            "academic_mapping": ac_map,
-            "persona_mapping": pc_map,
-            "full_df": processed_df,
-            "reduced_df": data5_df
+            "academic_labels": ac_labels,
+            "persona_labels": pc_labels
         }
 
-def visualise(data):
+        # The full scaled 20-column frame is only built for callers that want it
+        if include_frames:
+            processed_df = pd.DataFrame(preprocessing.scale_matrix(X), columns=encoding.COLUMNS, index=index)
+            data5_df = pd.DataFrame(reduced, columns=list(persona.THEME_MAP), index=index)
+            data5_df['Exam_Score'] = processed_df['Exam_Score']
+            result["full_df"] = processed_df
+            result["reduced_df"] = data5_df
+
+        # Label arrays are the primary output, index lists are derived from them
+        if include_mappings:
+            result["academic_mapping"] = assignment.labels_to_map(ac_labels, list(CENTROID3), index)
+            result["persona_mapping"] = assignment.labels_to_map(pc_labels, list(CENTROID5), index)
+
+        return result
+
+def visualise(data, chunksize=None):
     """
     Transforms analysis results into structured data for UI charts.
     Follows Phase 1 logic: Single student only shows Prediction + Spider Chart.
+    Passing `chunksize` streams CSV uploads instead of loading them whole.
     """
-    analysis = get_complete_analysis(data)
+    if chunksize and (isinstance(data, str) or hasattr(data, 'read')):
+        analysis = stream_analysis(data, chunksize)
+        with metrics.stage("charts"):
+            return batch_charts(analysis['table'], analysis['is_predicted'])
+
+    analysis = get_complete_analysis(data, include_mappings=False, include_frames=False)
     
     if analysis['mode'] == 'single':
-        # Result container
-        result = {
-            "type": "single",
-            "is_predicted": analysis['is_predicted'],
-            "charts": {
-                "spider_chart": {
-                    "data": [
-                        {"subject": k.replace('_', ' '), "value": round(v * 100, 2)} 
-                        for k, v in analysis['radar_data'].items()
-                    ]
-                }
+        return single_charts(analysis)
+    
+    else:
+        # Batch mode (Whole Group): every chart comes from the contingency table
+        with metrics.stage("crosstab"):
+            table = assignment.contingency_table(
+                analysis['academic_labels'], analysis['persona_labels'],
+                len(CENTROID3), len(CENTROID5)
+            )
+        with metrics.stage("charts"):
+            return batch_charts(table, analysis['is_predicted'])
+
+def visualise_local(data, max_iter=cluster.MAX_ITER, time_budget=cluster.TIME_BUDGET):
+    """
+    Batch charts for the pretrained centroids plus a 'class_local' section where
+    both models are refit on this class (see cluster.recluster). Class-local
+    clusters keep the pretrained names, and 'agreement' cross-tabulates
+    pretrained (rows) against class-local (columns) labels.
+    Needs every row at once, so uploads are never streamed in this mode.
+    """
+    _, X, is_predicted = _encode_batch(data)
+    ac_points = _academic_points(X)
+    with metrics.stage("reduce_themes"):
+        reduced = persona.project_themes(X)
+    n_ac, n_pc = len(CENTROID3), len(CENTROID5)
+
+    ac_labels, _ = academics.assign_ac(ac_points, CENTROID3)
+    pc_labels, _ = persona.assign_pc(reduced, CENTROID5)
+    result = batch_charts(assignment.contingency_table(ac_labels, pc_labels, n_ac, n_pc), is_predicted)
+
+    with metrics.stage("recluster"):
+        local_ac = cluster.recluster(ac_points, CENTROID3, max_iter=max_iter, time_budget=time_budget)
+        local_pc = cluster.recluster(reduced, CENTROID5, max_iter=max_iter, time_budget=time_budget)
+    local_table = assignment.contingency_table(local_ac['labels'], local_pc['labels'], n_ac, n_pc)
+
+    result["class_local"] = {
+        "charts": batch_charts(local_table, is_predicted)['charts'],
+        "centroids": {
+            "academic": {k: [round(v, 6) for v in c] for k, c in local_ac['centroids'].items()},
+            "persona": {k: [round(v, 6) for v in c] for k, c in local_pc['centroids'].items()}
+        },
+        "agreement": {
+            "academic": assignment.contingency_table(ac_labels, local_ac['labels'], n_ac, n_ac).tolist(),
+            "persona": assignment.contingency_table(pc_labels, local_pc['labels'], n_pc, n_pc).tolist()
+        },
+        "fit": {
+            name: {k: fit[k] for k in ("method", "n_iter", "converged")}
+            for name, fit in (("academic", local_ac), ("persona", local_pc))
+        }
+    }
+    return result
+
+def _needs_score(record):
+    """Same check as the single-student path: no usable Exam_Score given."""
+    return 'Exam_Score' not in record or record['Exam_Score'] is None or record['Exam_Score'] == ""
+
+def analyse_records(records):
+    """
+    Batched get_complete_analysis for many single-student dictionaries: one matrix
+    for prediction, scaling and theme reduction. Results are identical to the
+    one-by-one path. A record that fails gets its exception in its slot,
+    so it doesn't fail the rest of the batch.
+    """
+    results = [None] * len(records)
+    rows, scores, positions = [], [], []
+
+    for i, record in enumerate(records):
+        try:
+            if _needs_score(record):
+                missing = [c for c in encoding.FEATURE_ORDER if c not in record]
+                if missing:
+                    raise KeyError(f"Missing model features: {missing}")
+                score = np.nan
+            else:
+                score = encoding.encode_value('Exam_Score', record['Exam_Score'])
+            rows.append(encoding.encode_row(record, encoding.FEATURE_ORDER) + [score])
+            positions.append(i)
+        except Exception as exc:
+            results[i] = exc
+
+    if not rows:
+        return results
+
+    X = np.array(rows, dtype=np.float64)
+    exam = encoding.EXAM_INDEX
+    needs_score = np.isnan(X[:, exam])
+    if needs_score.any():
+        predicted = predict_score.predict_rows(X[needs_score, :exam]).tolist()
+        X[needs_score, exam] = [round(score, 2) for score in predicted] # Python rounding, like predict_exam_score
+
+    # reduce_record counts a key the student didn't send as 0
+    scaled = preprocessing.scale_matrix(X)
+    present = np.array([[c in records[i] or c == 'Exam_Score' for c in encoding.COLUMNS] for i in positions])
+    scaled[~present] = 0.0
+
+    # Theme means summed left to right, like reduce_record
+    themes = {}
+    for theme, columns in persona.THEME_MAP.items():
+        total = 0
+        for col in columns:
+            total = total + scaled[:, encoding.COLUMN_INDEX[col]]
+        themes[theme] = (total / len(columns)).tolist()
+
+    for row, i in enumerate(positions):
+        record = records[i]
+        predicted = bool(needs_score[row])
+        score = float(X[row, exam]) if predicted else record['Exam_Score']
+
+        scaled_record = dict(record, Exam_Score=score)
+        scaled_record.update({c: float(scaled[row, j]) for j, c in enumerate(encoding.COLUMNS) if c in scaled_record})
+
+        radar = {theme: values[row] for theme, values in themes.items()}
+        radar['Exam_Score'] = scaled_record['Exam_Score']
+
+        results[i] = {
+            "mode": "single",
+            "predicted_score": score,
+            "is_predicted": predicted,
+            "radar_data": radar,
+            "scaled_data": scaled_record
+        }
+    return results
+
+def visualise_records(records):
+    """visualise() for a batch of single students; failed records keep their exception."""
+    return [
+        analysis if isinstance(analysis, Exception) else single_charts(analysis)
+        for analysis in analyse_records(records)
+    ]
+
+def single_charts(analysis):
+    """Spider chart (and score) for one single-mode analysis."""
+    # Result container
+    result = {
+        "type": "single",
+        "is_predicted": analysis['is_predicted'],
+        "charts": {
+            "spider_chart": {
+                "data": [
+                    {"subject": k.replace('_', ' '), "value": round(v * 100, 2)} 
+                    for k, v in analysis['radar_data'].items()
+                ]
             }
         }
-        
-        # Phase 1 Logic: Only include score value if it was predicted 
-        # (or if you want to show provided score, keep it here)
-        if analysis['is_predicted']:
-            result["score_value"] = round(analysis['predicted_score'], 2)
-        else:
-            # If score was provided, the plan says return "5featurespiderchart" only
-            # but usually, dashboards still display the input score for context.
-            result["score_value"] = round(analysis['predicted_score'], 2)
+    }
 
-        return result
-    
+    # Phase 1 Logic: Only include score value if it was predicted 
+    # (or if you want to show provided score, keep it here)
+    if analysis['is_predicted']:
+        result["score_value"] = round(analysis['predicted_score'], 2)
     else:
-        # Batch mode (Whole Group) behavior remains unchanged
-        ac_map = analysis['academic_mapping']
-        pc_map = analysis['persona_mapping']
-        total_students = sum(len(v) for v in ac_map.values())
-
-        academic_pie = [
-            {"name": k, "value": len(v), "percentage": round((len(v)/total_students)*100, 2)}
-            for k, v in ac_map.items()
-        ]
+        # If score was provided, the plan says return "5featurespiderchart" only
+        # but usually, dashboards still display the input score for context.
+        result["score_value"] = round(analysis['predicted_score'], 2)
 
-        persona_pie = [
-            {"name": k, "value": len(v), "percentage": round((len(v)/total_students)*100, 2)}
-            for k, v in pc_map.items()
-        ]
+    return result
 
-        nested_breakdown = {}
-        for ac_key, ac_indices in ac_map.items():
-            breakdown = []
-            for pc_key, pc_indices in pc_map.items():
-                intersection = set(ac_indices).intersection(set(pc_indices))
-                if intersection:
-                    breakdown.append({
-                        "persona": pc_key,
-                        "count": len(intersection),
-                        "percentage": round((len(intersection)/len(ac_indices))*100, 2)
-                    })
-            nested_breakdown[ac_key] = breakdown
+def batch_charts(table, is_predicted, academic_names=None, persona_names=None):
+    """
+    Builds the batch charts from an (academic x persona) contingency table.
+    Works for any number of clusters on either axis.
+    """
+    academic_names = list(CENTROID3) if academic_names is None else academic_names
+    persona_names = list(CENTROID5) if persona_names is None else persona_names
 
-        return {
-            "type": "batch",
-            "is_predicted": analysis['is_predicted'],
-            "charts": {
-                "academic_distribution": academic_pie,
-                "overall_persona_distribution": persona_pie,
-                "persona_per_academic_cluster": nested_breakdown
+    # Plain ints keep the JSON output identical to the old list-based counts
+    table = [[int(c) for c in row] for row in table]
+    academic_counts = [sum(row) for row in table]
+    persona_counts = [sum(col) for col in zip(*table)]
+    total_students = sum(academic_counts)
+
+    academic_pie = [
+        {"name": k, "value": n, "percentage": round((n/total_students)*100, 2)}
+        for k, n in zip(academic_names, academic_counts)
+    ]
+
+    persona_pie = [
+        {"name": k, "value": n, "percentage": round((n/total_students)*100, 2)}
+        for k, n in zip(persona_names, persona_counts)
+    ]
+
+    nested_breakdown = {}
+    for ac_key, row, ac_total in zip(academic_names, table, academic_counts):
+        nested_breakdown[ac_key] = [
+            {
+                "persona": pc_key,
+                "count": count,
+                "percentage": round((count/ac_total)*100, 2)
             }
-        }
+            for pc_key, count in zip(persona_names, row) if count
+        ]
 
+    return {
+        "type": "batch",
+        "is_predicted": is_predicted,
+        "charts": {
+            "academic_distribution": academic_pie,
+            "overall_persona_distribution": persona_pie,
+            "persona_per_academic_cluster": nested_breakdown
+        }
+    }
@@ -0,0 +1,88 @@
+import numpy as np
+
+
+def centroid_table(centroids):
+    """
+    Splits a centroid dictionary (e.g. CENTROID3 / CENTROID5) into its
+    cluster names and a (k, d) float array, keeping the dictionary order.
+    """
+    names = list(centroids.keys())
+    table = np.asarray([centroids[name] for name in names], dtype=np.float64)
+    return names, table
+
+
+def label_dtype(n_clusters):
+    """Smallest integer dtype that can hold a label for n_clusters."""
+    return np.int8 if n_clusters <= np.iinfo(np.int8).max else np.int32
+
+
+# Rows per block in nearest_centroid: float64 temporaries stay a few MB whatever the upload size
+BLOCK_ROWS = 65536
+
+
+def nearest_centroid(points, centroids):
+    """
+    Assigns every row of `points` (n, d) to its closest centroid (k, d),
+    vectorized over blocks of BLOCK_ROWS rows.
+
+    Returns:
+        labels    -> compact integer array (n,) with the index of the centroid
+        distances -> float array (n,) with the Euclidean distance to it
+    Ties go to the first centroid, same as the old row-by-row loops.
+    Raises ValueError for points with NaN coordinates.
+    """
+    points = np.asarray(points)
+    centroids = np.asarray(centroids, dtype=np.float64)
+
+    if points.ndim != 2 or points.shape[1] != centroids.shape[1]:
+        raise ValueError(
+            f"Points of shape {points.shape} do not match centroids of shape {centroids.shape}"
+        )
+
+    labels = np.empty(len(points), dtype=label_dtype(len(centroids)))
+    distances = np.empty(len(points))
+    for start in range(0, len(points), BLOCK_ROWS):
+        # Float32 inputs are widened one block at a time, never as a whole copy
+        block = np.asarray(points[start:start + BLOCK_ROWS], dtype=np.float64)
+        if np.isnan(block).any():
+            # NaN distances would all lose the comparison and land on centroid 0
+            raise ValueError("Points with missing (NaN) coordinates can't be assigned to a centroid")
+
+        # (rows, k) squared distances, filled one centroid at a time so the
+        # temporary stays (rows, d) instead of (rows, k, d)
+        sq_dist = np.empty((len(block), len(centroids)))
+        for j, centroid in enumerate(centroids):
+            sq_dist[:, j] = ((block - centroid) ** 2).sum(axis=1)
+
+        block_labels = sq_dist.argmin(axis=1)
+        labels[start:start + len(block)] = block_labels
+        distances[start:start + len(block)] = np.sqrt(sq_dist[np.arange(len(block)), block_labels])
+
+    return labels, distances
+
+
+def labels_to_map(labels, names, index=None):
+    """
+    Turns a label array back into the {cluster_name: [row indices]} dictionary
+    used by the rest of the app. `index` holds the original row labels
+    (e.g. DataFrame.index); positions are used when it is not given.
+    """
+    index = np.arange(len(labels)) if index is None else np.asarray(index)
+    order = np.argsort(labels, kind="stable")
+    bounds = np.searchsorted(labels[order], np.arange(len(names) + 1))
+
+    return {
+        name: index[order[bounds[i]:bounds[i + 1]]].tolist()
+        for i, name in enumerate(names)
+    }
+
+
+def contingency_table(row_labels, col_labels, n_rows, n_cols):
+    """
+    Counts how many rows fall in every (row_label, col_label) pair with a
+    single bincount. Returns an (n_rows, n_cols) integer table.
+    """
+    row_labels = np.asarray(row_labels, dtype=np.int64)
+    col_labels = np.asarray(col_labels, dtype=np.int64)
+    flat = np.bincount(row_labels * n_cols + col_labels, minlength=n_rows * n_cols)
+    return flat.reshape(n_rows, n_cols)
@@ -0,0 +1,264 @@
+import multiprocessing
+import os
+import shutil
+import signal
+import tempfile
+import threading
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+try:
+    from . import analyze
+except ImportError:
+    import analyze
+
+# Bulk analysis: one school = many class CSVs (one per section).
+# Every class is analysed in a worker process with the same streaming path as
+# /analyzeGroup, and sends back its (academic x persona) contingency table. The
+# school-level charts are built from the sum of those tables, not from the rows.
+
+
+class FileTimeout(TimeoutError):
+    pass
+
+
+def _on_alarm(signum, frame):
+    raise FileTimeout()
+
+def _analyse_class(path, chunksize, timeout):
+    """Worker process: (table as nested lists, is_predicted) of one class CSV."""
+    # The timer interrupts this file only; the worker process goes on to the next one
+    previous = signal.signal(signal.SIGALRM, _on_alarm)
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        analysis = analyze.stream_analysis(path, chunksize)
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+    return analysis["table"].tolist(), analysis["is_predicted"]
+
+
+def _unique_name(name, taken):
+    base, ext = os.path.splitext(name)
+    candidate, n = name, 1
+    while candidate in taken:
+        n += 1
+        candidate = f"{base} ({n}){ext}"
+    taken.add(candidate)
+    return candidate
+
+def _copy_limited(source, target, limit, block_size=1 << 20):
+    """Copies source into target; ValueError once more than `limit` bytes came through."""
+    copied = 0
+    for block in iter(lambda: source.read(block_size), b""):
+        copied += len(block)
+        if copied > limit:
+            raise ValueError("Upload too large")
+        target.write(block)
+    return copied
+
+def spool_uploads(files, directory, max_files, max_bytes):
+    """
+    Writes every class CSV of the uploaded files into `directory`; zip archives are
+    expanded (their .csv members only). Returns [(class name, path)] in upload order.
+    Raises ValueError past max_files classes or max_bytes of CSV in total.
+    """
+    classes, taken = [], set()
+    budget = max_bytes
+
+    def add(name, source):
+        nonlocal budget
+        if len(classes) >= max_files:
+            raise ValueError(f"More than {max_files} class files")
+        path = os.path.join(directory, f"{len(classes)}.csv")
+        with open(path, "wb") as target:
+            try:
+                budget -= _copy_limited(source, target, budget)
+            except ValueError:
+                raise ValueError(f"Classes larger than {max_bytes // 2**20} MB in total") from None
+        classes.append((_unique_name(os.path.basename(name) or "class.csv", taken), path))
+
+    for file in files:
+        if not file.filename.lower().endswith(".zip"):
+            add(file.filename, file.stream)
+            continue
+        with zipfile.ZipFile(file.stream) as archive:
+            for member in archive.infolist():
+                name = member.filename
+                if member.is_dir() or not name.lower().endswith(".csv") or name.startswith("__MACOSX/"):
+                    continue
+                with archive.open(member) as source:
+                    add(name, source)
+    return classes
+
+
+# How often analyse() looks for a stuck worker, and the slack on top of its deadline
+POLL_S = 0.5
+GRACE_S = 10
+# Resubmissions of a class whose pool broke under it (e.g. killed because of another stuck class)
+RETRIES = 1
+
+
+class BulkAnalyzer:
+    """
+    Analyses many class CSVs in parallel on a process pool.
+
+    - max_workers: pool processes (per app worker)
+    - timeout: seconds one class may take once it runs; a slower class is reported
+      as timed out and the others carry on
+    - chunksize: rows per chunk, as in analyze.stream_analysis
+    - max_files / max_bytes: limits on one upload (zip members count one by one)
+    The pool is started lazily, so a gunicorn master that forks never owns one.
+    It is shared by concurrent requests; a pool with a stuck worker is killed and
+    replaced, and the other classes that were in it run again on the new one.
+    """
+
+    def __init__(self, max_workers=None, timeout=60, chunksize=analyze.STREAM_CHUNK_ROWS,
+                 max_files=500, max_bytes=1 << 30):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.timeout = timeout
+        self.chunksize = chunksize
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+
+        self._pool = None
+        self._pool_pid = None
+        self._lock = threading.Lock()
+        self._counters = {"requests": 0, "classes": 0, "failed": 0, "timed_out": 0, "pool_restarts": 0,
+                          "resubmitted": 0}
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None or self._pool_pid != os.getpid():
+                # forkserver: workers are never forked from a process running request threads
+                method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                 mp_context=multiprocessing.get_context(method))
+                self._pool_pid = os.getpid()
+            return self._pool
+
+    def _discard_pool(self, pool):
+        """
+        Replaces a pool and kills its worker processes; shutdown() alone would leave
+        a hung worker running. Nothing is cancelled: other requests' classes in the
+        pool fail with BrokenProcessPool and their analyse() resubmits them.
+        """
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+                self._counters["pool_restarts"] += 1
+        if hasattr(pool, "terminate_workers"): # Python 3.14+
+            pool.terminate_workers()
+        else:
+            for process in list((getattr(pool, "_processes", None) or {}).values()):
+                process.terminate()
+        pool.shutdown(wait=False)
+
+    def _submit(self, path):
+        """(pool, future) of one class, on a new pool if the current one broke or was discarded meanwhile."""
+        pool = self._get_pool()
+        try:
+            return pool, pool.submit(_analyse_class, path, self.chunksize, self.timeout)
+        except (BrokenProcessPool, RuntimeError): # RuntimeError: shut down by another request
+            self._discard_pool(pool)
+            pool = self._get_pool()
+            return pool, pool.submit(_analyse_class, path, self.chunksize, self.timeout)
+
+    def _run(self, paths):
+        """
+        One outcome per class path: the worker's result, its exception, or
+        FileTimeout for a class whose worker got stuck.
+        """
+        outcomes = [None] * len(paths)
+        pending = {} # future -> (class index, pool, retries left)
+        for i, path in enumerate(paths):
+            pool, future = self._submit(path)
+            pending[future] = (i, pool, RETRIES)
+        started = {}
+
+        while pending:
+            done, _ = wait(pending, timeout=POLL_S, return_when=FIRST_COMPLETED)
+            for future in done:
+                i, pool, retries = pending.pop(future)
+                if isinstance(future.exception(), BrokenProcessPool) and retries:
+                    self._discard_pool(pool)
+                    pool, future = self._submit(paths[i])
+                    pending[future] = (i, pool, retries - 1)
+                    with self._lock:
+                        self._counters["resubmitted"] += 1
+                else:
+                    outcomes[i] = future.exception() or future.result()
+
+            # Per-file timeouts are enforced inside the workers. The deadline here only
+            # catches a worker stuck outside Python, and counts from when the class was
+            # handed to the workers, never from work queued by other requests. The
+            # executor hands over one class more than it has workers, so a class may
+            # still wait for one other class: hence 2 timeouts.
+            now = time.monotonic()
+            for future, (i, pool, _) in list(pending.items()):
+                if future.running() and now - started.setdefault(future, now) > 2 * self.timeout + GRACE_S:
+                    del pending[future]
+                    outcomes[i] = FileTimeout()
+                    self._discard_pool(pool)
+        return outcomes
+
+    def analyse(self, classes):
+        """
+        classes: [(name, csv path)]. Returns the bulk result: per-class charts
+        (or an error) in input order, plus the school charts from the summed tables.
+        """
+        outcomes = self._run([path for _, path in classes])
+
+        n_ac, n_pc = len(analyze.CENTROID3), len(analyze.CENTROID5)
+        school_table = np.zeros((n_ac, n_pc), dtype=np.int64)
+        school_predicted = False
+        results, failed, timed_out = [], 0, 0
+
+        for (name, _), outcome in zip(classes, outcomes):
+            entry = {"name": name}
+            try:
+                if isinstance(outcome, BaseException):
+                    raise outcome
+                table, is_predicted = outcome
+                if not np.sum(table):
+                    raise ValueError("No student rows")
+                charts = analyze.batch_charts(table, is_predicted)
+            except FileTimeout:
+                entry.update(status="timeout", error=f"Took longer than {self.timeout:g} s")
+                timed_out += 1
+            except Exception as exc:
+                entry.update(status="error", error=f"{type(exc).__name__}: {exc}")
+                failed += 1
+            else:
+                school_table += np.asarray(table, dtype=np.int64)
+                school_predicted = school_predicted or is_predicted
+                entry.update(status="ok", students=int(np.sum(table)), is_predicted=is_predicted,
+                             charts=charts["charts"])
+            results.append(entry)
+
+        with self._lock:
+            self._counters["requests"] += 1
+            self._counters["classes"] += len(classes)
+            self._counters["failed"] += failed
+            self._counters["timed_out"] += timed_out
+
+        analysed = len(classes) - failed - timed_out
+        school = analyze.batch_charts(school_table, school_predicted) if analysed else None
+        return {
+            "type": "bulk",
+            "classes": results,
+            "school": dict(school, classes=analysed, students=int(school_table.sum())) if school else None
+        }
+
+    def analyse_uploads(self, files):
+        """analyse() for uploaded files (CSVs and/or zips), spooled to a temp folder meanwhile."""
+        with tempfile.TemporaryDirectory(prefix="bulk-") as directory:
+            return self.analyse(spool_uploads(files, directory, self.max_files, self.max_bytes))
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counters, max_workers=self.max_workers, timeout=self.timeout)
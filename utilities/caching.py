@@ -0,0 +1,136 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+def hash_stream(stream, block_size=1 << 20):
+    """
+    SHA-256 of a file-like object's bytes, read in blocks.
+    The stream is rewound afterwards so it can still be parsed.
+    """
+    digest = hashlib.sha256()
+    stream.seek(0)
+    for block in iter(lambda: stream.read(block_size), b""):
+        digest.update(block)
+    stream.seek(0)
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    Bounded LRU cache with a TTL, for JSON-serialisable values.
+
+    - max_entries: in-memory capacity, least recently used entries are evicted first
+    - ttl: seconds an entry stays valid (memory and disk)
+    - disk_dir: optional folder for a second tier that survives worker restarts
+      (with max_entries=0 the disk is the only tier, always fresh across workers)
+    - disk_max_entries: files kept on disk, checked every disk_prune_every writes,
+      so each process can overshoot it by that many
+    """
+
+    def __init__(self, max_entries=128, ttl=3600, disk_dir=None, disk_max_entries=1024, disk_prune_every=32):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disk_dir = disk_dir
+        self.disk_max_entries = disk_max_entries
+        self.disk_prune_every = disk_prune_every
+        self._disk_writes = 0
+
+        self._entries = OrderedDict() # key -> (stored_at, value)
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def get(self, key):
+        """Returns the cached value, or None on a miss."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if now - entry[0] <= self.ttl:
+                    self._entries.move_to_end(key)
+                    self._counters["hits"] += 1
+                    return entry[1]
+                del self._entries[key]
+                self._counters["expirations"] += 1
+
+        entry = self._read_disk(key, now)
+        with self._lock:
+            if entry is None:
+                self._counters["misses"] += 1
+                return None
+            self._counters["disk_hits"] += 1
+            self._store(key, entry)
+        return entry[1]
+
+    def set(self, key, value):
+        entry = (time.time(), value)
+        with self._lock:
+            self._store(key, entry)
+        self._write_disk(key, entry)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counters, entries=len(self._entries), max_entries=self.max_entries)
+
+    def _store(self, key, entry):
+        # Caller holds the lock
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._counters["evictions"] += 1
+
+    # ---- optional disk tier ----
+
+    def _disk_path(self, key):
+        # Keys can be arbitrary strings, so hash them into a safe file name
+        return os.path.join(self.disk_dir, hashlib.sha256(key.encode()).hexdigest() + ".json")
+
+    def _read_disk(self, key, now):
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path) as file:
+                stored = json.load(file)
+            if stored["key"] != key or now - stored["stored_at"] > self.ttl:
+                return None
+            return stored["stored_at"], stored["value"]
+        except (OSError, ValueError, KeyError, TypeError):
+            return None # unreadable, or not an entry this cache wrote: a miss
+
+    def _write_disk(self, key, entry):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w") as file:
+                json.dump({"key": key, "stored_at": entry[0], "value": entry[1]}, file)
+            os.replace(tmp_path, path) # atomic, other workers never see half a file
+            with self._lock:
+                self._disk_writes += 1
+                prune = self._disk_writes % self.disk_prune_every == 0
+            if prune:
+                self._prune_disk() # lists and stats the whole folder, so not on every write
+        except OSError:
+            pass # the disk tier is best effort
+
+    def _prune_disk(self):
+        files = [os.path.join(self.disk_dir, f) for f in os.listdir(self.disk_dir) if f.endswith(".json")]
+        if len(files) <= self.disk_max_entries:
+            return
+        files.sort(key=os.path.getmtime)
+        for path in files[:len(files) - self.disk_max_entries]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
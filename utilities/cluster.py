@@ -1,13 +1,71 @@
-# the aim of this is to have code for clustering data on the 2 logics(persona , academics)
-# so that we can just cluster user data on the logics we define
-#we define the features used for clustering, we define K
-# seeing the centroids and the background things let AI give names to the clusters
+import time
 
-# we can obviously use our pretrained models but how about the case when all of the user data belongs to cluster1 of our pretrained model(that is the way, in which the data differs, is not the same way as the training data differed )
+import numpy as np
 
-# that means we can just import our clustering code and let it cluster the user data based on how it differs
+try:
+    from . import assignment
+    from . import kmeans
+except ImportError:
+    import assignment
+    import kmeans
 
-# this way we make it data independent
+# Clusters the user's own data on the 2 logics (persona, academics), with the
+# features and K of the pretrained models.
+#
+# The pretrained centroids describe how the training data differed. A class can
+# differ in another way (e.g. every student lands in cluster1 of the pretrained
+# model), so here k-means is refit on the uploaded class itself. It starts from
+# the pretrained centroids: it converges in a few iterations and cluster i keeps
+# the pretrained name i, so both results can be shown side by side.
 
-# what about mayank's model
-# i think we can use our existing models
\ No newline at end of file
+# Budget per model, small enough to keep /analyzeGroup interactive at 100k rows
+MAX_ITER = 50
+TIME_BUDGET = 0.25 # seconds
+
+# Above this many rows full Lloyd iterations get replaced by mini-batches
+MINIBATCH_ROWS = 20000
+BATCH_SIZE = 2048
+
+def recluster(points, centroids, max_iter=MAX_ITER, time_budget=TIME_BUDGET,
+              minibatch_rows=MINIBATCH_ROWS, batch_size=BATCH_SIZE, seed=0):
+    """
+    Class-local refit of a pretrained model on `points` (n, d), warm-started
+    from its centroid dictionary. Rows with missing (NaN) values are rejected
+    with a ValueError, as assignment.nearest_centroid does.
+
+    Returns a dict with:
+        centroids -> {pretrained name: class-local centroid}
+        labels    -> (n,) labels in the same order as the pretrained ones
+        method, n_iter, converged, seconds -> how the fit went
+    """
+    start = time.perf_counter()
+    names, table = assignment.centroid_table(centroids)
+    points = np.asarray(points, dtype=np.float64)
+    if np.isnan(points).any():
+        raise ValueError("Points with missing (NaN) coordinates can't be assigned to a centroid")
+
+    if len(points) < len(names):
+        # Too few students to move K centroids, keep the pretrained ones
+        fitted = {"centroids": table, "n_iter": 0, "converged": True}
+        method = "pretrained"
+    elif len(points) > minibatch_rows:
+        fitted = kmeans.minibatch_fit(points, table, batch_size=batch_size, max_iter=max_iter,
+                                      seed=seed, time_budget=time_budget)
+        method = "minibatch"
+    else:
+        fitted = kmeans.fit(points, len(names), init=table, max_iter=max_iter, time_budget=time_budget)
+        method = "lloyd"
+
+    if method != "pretrained":
+        labels = fitted["labels"]
+    else:
+        labels, _ = assignment.nearest_centroid(points, fitted["centroids"])
+
+    return {
+        "centroids": {name: fitted["centroids"][i].tolist() for i, name in enumerate(names)},
+        "labels": labels,
+        "method": method,
+        "n_iter": fitted["n_iter"],
+        "converged": fitted["converged"],
+        "seconds": time.perf_counter() - start
+    }
@@ -0,0 +1,95 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class RequestCoalescer:
+    """
+    Collects items submitted by concurrent requests for up to `window_ms`
+    (or until `max_batch` items are waiting) and runs them through
+    `process_batch(items) -> results` in one call. Each caller gets its own result;
+    a result that is an Exception is raised in that caller only.
+    """
+
+    def __init__(self, process_batch, window_ms=5, max_batch=64, timeout=30):
+        self.process_batch = process_batch
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self.timeout = timeout
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker_pid = None # the batching thread is (re)started lazily, e.g. after a fork
+        self._counters = {"batches": 0, "items": 0, "max_batch_seen": 0,
+                          "wait_seconds_total": 0.0, "batch_seconds_total": 0.0}
+        self._size_histogram = {} # batch size -> number of batches
+
+    def submit(self, item):
+        """Blocks until the batch containing `item` is processed, then returns its result."""
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((item, future, time.perf_counter()))
+        result = future.result(timeout=self.timeout)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def _ensure_worker(self):
+        if self._worker_pid == os.getpid():
+            return
+        with self._lock:
+            if self._worker_pid != os.getpid():
+                threading.Thread(target=self._run, name="coalescer", daemon=True).start()
+                self._worker_pid = os.getpid()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.perf_counter() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._process(batch)
+
+    def _process(self, batch):
+        started = time.perf_counter()
+        items = [item for item, _, _ in batch]
+        try:
+            results = self.process_batch(items)
+        except Exception as exc:
+            results = [exc] * len(batch)
+        finished = time.perf_counter()
+
+        for (_, future, _), result in zip(batch, results):
+            future.set_result(result)
+
+        with self._lock:
+            size = len(batch)
+            self._counters["batches"] += 1
+            self._counters["items"] += size
+            self._counters["max_batch_seen"] = max(self._counters["max_batch_seen"], size)
+            self._counters["wait_seconds_total"] += sum(started - queued for _, _, queued in batch)
+            self._counters["batch_seconds_total"] += finished - started
+            self._size_histogram[size] = self._size_histogram.get(size, 0) + 1
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+            histogram = dict(sorted(self._size_histogram.items()))
+        batches = counters["batches"] or 1
+        items = counters["items"] or 1
+        return dict(
+            counters,
+            window_ms=self.window * 1000,
+            max_batch=self.max_batch,
+            mean_batch_size=counters["items"] / batches,
+            mean_wait_ms=counters["wait_seconds_total"] / items * 1000,
+            batch_size_histogram=histogram
+        )
@@ -0,0 +1,179 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+try:
+    from . import caching
+except ImportError:
+    import caching
+
+# Binary training dataset: a float32 matrix that is memory-mapped instead of parsed.
+#
+#   8 bytes   MAGIC
+#   4 bytes   header length (little-endian uint32)
+#   n bytes   JSON header: shape, columns, scaling reference, source hash...
+#   padding   up to a multiple of ALIGNMENT
+#   data      float32, column-major (each feature is one contiguous run)
+#
+# Opening one only reads the header; pages are loaded on demand and shared
+# through the OS page cache by every process that maps the same file.
+
+MAGIC = b"SPDSET01"
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+EXTENSION = ".f32"
+
+def _data_offset(header_bytes):
+    unpadded = len(MAGIC) + 4 + len(header_bytes)
+    return -(-unpadded // ALIGNMENT) * ALIGNMENT
+
+def _header(shape, columns, reference=None, source_hash=None, meta=None):
+    if len(columns) != shape[1]:
+        raise ValueError(f"{len(columns)} column names for a matrix with {shape[1]} columns")
+    return {
+        "format_version": FORMAT_VERSION,
+        "dtype": "<f4",
+        "order": "F",
+        "shape": [int(shape[0]), int(shape[1])],
+        "columns": list(columns),
+        "reference": reference,
+        "source_sha256": source_hash,
+        "meta": meta or {}
+    }
+
+def _create(path, header):
+    """Writes the header and sizes the file; returns a writable memmap on the data."""
+    header_bytes = json.dumps(header).encode()
+    offset = _data_offset(header_bytes)
+    with open(path, "wb") as file:
+        file.write(MAGIC)
+        file.write(len(header_bytes).to_bytes(4, "little"))
+        file.write(header_bytes)
+        file.write(b"\0" * (offset - file.tell()))
+        file.truncate(offset + 4 * header["shape"][0] * header["shape"][1])
+    if 0 in header["shape"]:
+        return None
+    return np.memmap(path, dtype="<f4", mode="r+", offset=offset, shape=tuple(header["shape"]), order="F")
+
+def write_dataset(path, matrix, columns, reference=None, source_hash=None, meta=None):
+    """
+    Stores an (n, d) matrix as a dataset file (atomically, via a temp file).
+    reference: the scaling constants the values went through, e.g. REFERENCE_DICT
+    source_hash: content hash of what the matrix was built from
+    """
+    matrix = np.asarray(matrix)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    data = _create(tmp_path, _header(matrix.shape, columns, reference, source_hash, meta))
+    if data is not None:
+        data[:] = matrix
+        data.flush()
+        del data
+    os.replace(tmp_path, path)
+    return path
+
+def read_header(path):
+    """The JSON header of a dataset file (plus the byte offset of the data)."""
+    with open(path, "rb") as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a dataset file")
+        header_bytes = file.read(int.from_bytes(file.read(4), "little"))
+    header = json.loads(header_bytes)
+    if header.get("format_version") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported dataset format: {header.get('format_version')}")
+    header["offset"] = _data_offset(header_bytes)
+    return header
+
+def is_dataset(path):
+    try:
+        with open(path, "rb") as file:
+            return file.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+def open_dataset(path):
+    """
+    Memory-maps a dataset file read-only.
+    Returns (matrix, header); the matrix is an (n, d) float32 view on the file.
+    """
+    header = read_header(path)
+    shape = tuple(header["shape"])
+    if 0 in shape:
+        return np.empty(shape, dtype=np.float32, order="F"), header
+    matrix = np.memmap(path, dtype="<f4", mode="r", offset=header["offset"], shape=shape, order="F")
+    return matrix, header
+
+def select(matrix, all_columns, columns):
+    """
+    The given columns of a dataset matrix, in the requested order.
+    Adjacent columns in file order come back as a view (no copy).
+    """
+    positions = [all_columns.index(c) for c in columns]
+    first = positions[0]
+    if positions == list(range(first, first + len(positions))):
+        return matrix[:, first:first + len(positions)]
+    return np.asfortranarray(matrix[:, positions])
+
+def load_matrix(path, columns):
+    """
+    Training data loader: the given columns of a dataset file (memory-mapped float32)
+    or of a CSV (parsed, float64). Returns an (n, len(columns)) matrix.
+    """
+    if is_dataset(path):
+        matrix, header = open_dataset(path)
+        missing = [c for c in columns if c not in header["columns"]]
+        if missing:
+            raise KeyError(f"Missing dataset columns: {missing}")
+        return select(matrix, header["columns"], columns)
+    return pd.read_csv(path, usecols=columns)[columns].to_numpy(dtype=np.float64)
+
+def count_rows(csv_path, block_size=1 << 20):
+    """Data rows of a CSV (newline count minus the header), without parsing it."""
+    lines, last = 0, b"\n"
+    with open(csv_path, "rb") as file:
+        for block in iter(lambda: file.read(block_size), b""):
+            lines += block.count(b"\n")
+            last = block[-1:]
+    if last != b"\n":
+        lines += 1
+    return max(lines - 1, 0)
+
+def csv_to_dataset(csv_path, path, columns=None, reference=None, source_hash=None, chunksize=100000):
+    """
+    Converts a numeric CSV into a dataset file chunk by chunk, so memory stays
+    bounded by `chunksize` rows however big the CSV is.
+    """
+    if columns is None:
+        columns = list(pd.read_csv(csv_path, nrows=0).columns)
+    n_rows = count_rows(csv_path)
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    data = _create(tmp_path, _header((n_rows, len(columns)), columns, reference, source_hash))
+    row = 0
+    for chunk in pd.read_csv(csv_path, usecols=columns, chunksize=chunksize):
+        data[row:row + len(chunk)] = chunk[columns].to_numpy(dtype=np.float32)
+        row += len(chunk)
+    if row != n_rows:
+        raise ValueError(f"Counted {n_rows} rows in {csv_path} but parsed {row}")
+    if data is not None:
+        data.flush()
+        del data
+    os.replace(tmp_path, path)
+    return path
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Convert a numeric CSV into a memory-mapped dataset file.")
+    parser.add_argument("csv")
+    parser.add_argument("output", nargs="?", help=f"defaults to the CSV path with {EXTENSION}")
+    parser.add_argument("--columns", nargs="+", help="keep only these columns")
+    args = parser.parse_args()
+
+    with open(args.csv, "rb") as file:
+        source_hash = caching.hash_stream(file)
+    output = args.output or os.path.splitext(args.csv)[0] + EXTENSION
+    csv_to_dataset(args.csv, output, args.columns, source_hash=source_hash)
+    header = read_header(output)
+    print(f"{output}: {header['shape'][0]} x {header['shape'][1]} float32")
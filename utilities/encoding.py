@@ -0,0 +1,108 @@
+import numpy as np
+
+# pandas is imported inside the batch functions only: the single-student
+# path (encode_row / encode_value) never needs it
+
+# Single source of truth for turning raw student data into numbers.
+# Used by preprocessing (scaling), persona (themes) and predict_score (Model 3).
+
+ORDINAL_MAP = {'Low': 0, 'Medium': 1, 'High': 2}
+BINARY_MAP = {'No': 0, 'Yes': 1}
+
+CATEGORY_MAPS = {
+    'Parental_Involvement': ORDINAL_MAP,
+    'Access_to_Resources': ORDINAL_MAP,
+    'Motivation_Level': ORDINAL_MAP,
+    'Family_Income': ORDINAL_MAP,
+    'Teacher_Quality': ORDINAL_MAP,
+    'Extracurricular_Activities': BINARY_MAP,
+    'Internet_Access': BINARY_MAP,
+    'Learning_Disabilities': BINARY_MAP,
+    'School_Type': {'Public': 0, 'Private': 1},
+    'Peer_Influence': {'Negative': 0, 'Neutral': 1, 'Positive': 2},
+    'Parental_Education_Level': {'High School': 0, 'College': 1, 'Postgraduate': 2},
+    'Distance_from_Home': {'Near': 0, 'Moderate': 1, 'Far': 2},
+    'Gender': {'Female': 0, 'Male': 1}
+}
+
+# Missing or unknown categories get this code. It is what the training data
+# (dataConversions/numericConversion.py) used, hence the -1 minimums in REFERENCE_DICT.
+MISSING_CODE = -1
+
+# The 19 model inputs in the order Model 3 was trained on
+FEATURE_ORDER = [
+    'Hours_Studied', 'Attendance', 'Parental_Involvement', 'Access_to_Resources',
+    'Extracurricular_Activities', 'Sleep_Hours', 'Previous_Scores', 'Motivation_Level',
+    'Internet_Access', 'Tutoring_Sessions', 'Family_Income', 'Teacher_Quality',
+    'School_Type', 'Peer_Influence', 'Physical_Activity', 'Learning_Disabilities',
+    'Parental_Education_Level', 'Distance_from_Home', 'Gender'
+]
+
+# Full encoded row: the 19 features followed by the target
+COLUMNS = FEATURE_ORDER + ['Exam_Score']
+COLUMN_INDEX = {col: i for i, col in enumerate(COLUMNS)}
+EXAM_INDEX = COLUMN_INDEX['Exam_Score']
+
+# Compact dtypes for reading class CSVs: categorical columns are held as int8
+# category codes instead of Python strings, numeric ones as float32
+READ_DTYPES = {col: "category" if col in CATEGORY_MAPS else "float32" for col in COLUMNS}
+
+# Precompiled lookups: category labels plus their codes, so a whole column is
+# encoded with one pd.Categorical pass and one take()
+_LOOKUPS = {
+    col: (list(m.keys()), np.append(np.array(list(m.values()), dtype=np.float64), MISSING_CODE))
+    for col, m in CATEGORY_MAPS.items()
+}
+
+
+def read_csv(source, dtype=None, **kwargs):
+    """
+    pd.read_csv with READ_DTYPES, plus `dtype` for extra columns (e.g. an ID kept as text).
+    Other keyword arguments, e.g. chunksize, are passed on.
+    """
+    import pandas as pd
+    return pd.read_csv(source, dtype=dict(READ_DTYPES, **(dtype or {})), **kwargs)
+
+
+def missing_columns(df, columns=FEATURE_ORDER):
+    """Columns from `columns` that the DataFrame doesn't have."""
+    return [c for c in columns if c not in df.columns]
+
+
+def encode_frame(df, columns=COLUMNS, dtype=np.float32):
+    """
+    Encodes a raw DataFrame into one contiguous (n, len(columns)) matrix.
+    Categorical columns go through the lookup tables, numeric columns are cast.
+    Columns absent from the DataFrame come out as NaN.
+    """
+    import pandas as pd
+    X = np.empty((len(df), len(columns)), dtype=dtype)
+
+    for j, col in enumerate(columns):
+        if col not in df.columns:
+            X[:, j] = np.nan
+        elif col in _LOOKUPS:
+            labels, codes = _LOOKUPS[col]
+            # Unknown / missing values get category code -1, i.e. the last slot (MISSING_CODE)
+            X[:, j] = codes[pd.Categorical(df[col], categories=labels).codes]
+        else:
+            X[:, j] = pd.to_numeric(df[col]).to_numpy(dtype=dtype, na_value=np.nan)
+
+    return X
+
+
+def encode_value(col, value):
+    """Encodes one raw value of column `col`."""
+    if col in CATEGORY_MAPS:
+        return float(CATEGORY_MAPS[col].get(value, MISSING_CODE))
+    return float('nan') if value is None else float(value)
+
+
+def encode_row(record, columns=COLUMNS):
+    """Encodes a single student dictionary into a plain list of floats (no numpy/pandas)."""
+    return [encode_value(col, record[col]) if col in record else float('nan') for col in columns]
+
+
+def encode_record(record, columns=COLUMNS):
+    """Encodes a single student dictionary into a (1, len(columns)) float64 matrix."""
+    return np.array([encode_row(record, columns)], dtype=np.float64)
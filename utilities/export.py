@@ -0,0 +1,85 @@
+import csv
+import io
+import json
+
+try:
+    from . import analyze
+except ImportError:
+    import analyze
+
+# Per-student export: analyze.stream_students chunks formatted as NDJSON or CSV text.
+# Each generator yields one string per chunk (CSV: the header first), so a Flask
+# streaming response sends rows while the rest of the upload is still being processed.
+
+FIELDS = ["row", "id", "academic_cluster", "persona", "exam_score", "predicted_score", "score_imputed"]
+FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+def _score(value):
+    # NaN (a student whose features can't be scored) becomes null / an empty cell
+    return None if value != value else round(value, 2)
+
+def _id(value):
+    # A blank Student_ID cell is read as NaN, which json.dumps would write as bare NaN
+    return None if value != value else value
+
+def columns(chunk):
+    """The export columns of one stream_students chunk, as Python lists in FIELDS order."""
+    academic_names = list(analyze.CENTROID3)
+    persona_names = list(analyze.CENTROID5)
+    n = len(chunk["row"])
+    return [
+        chunk["row"].tolist(),
+        [_id(v) for v in chunk["id"].tolist()] if chunk["id"] is not None else [None] * n,
+        [academic_names[i] if i != analyze.NO_LABEL else None for i in chunk["academic"].tolist()],
+        [persona_names[i] for i in chunk["persona"].tolist()],
+        [_score(v) for v in chunk["exam_score"].tolist()],
+        [_score(v) for v in chunk["predicted_score"].tolist()],
+        chunk["score_imputed"].tolist()
+    ]
+
+def rows(chunk):
+    """The export rows of one stream_students chunk, as tuples in FIELDS order."""
+    return zip(*columns(chunk))
+
+# One NDJSON line, same text as json.dumps(dict(zip(FIELDS, row))). Lines are
+# assembled from per-column JSON: values repeat a lot, so each distinct one is encoded once.
+_NDJSON_LINE = "{{" + ", ".join(f'"{field}": {{}}' for field in FIELDS) + "}}\n"
+
+def _json_column(values):
+    encoded = {}
+    return [encoded[v] if v in encoded else encoded.setdefault(v, json.dumps(v)) for v in values]
+
+def ndjson_lines(chunks):
+    for chunk in chunks:
+        row, *rest = columns(chunk)
+        yield "".join(map(_NDJSON_LINE.format, row, *map(_json_column, rest)))
+
+def csv_lines(chunks):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(FIELDS)
+    yield buffer.getvalue()
+
+    for chunk in chunks:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(rows(chunk))
+        yield buffer.getvalue()
+
+def export_students(data, fmt="ndjson", chunksize=analyze.STREAM_CHUNK_ROWS):
+    """
+    Text generator of the per-student export of a class CSV (path or file-like object).
+    The first chunk is analysed before returning, so a bad upload raises here
+    rather than halfway through a response.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format: {fmt} (expected one of {list(FORMATS)})")
+    chunks = analyze.stream_students(data, chunksize)
+    first = next(chunks, None)
+
+    def all_chunks():
+        if first is not None:
+            yield first
+            yield from chunks
+
+    return (ndjson_lines if fmt == "ndjson" else csv_lines)(all_chunks())
@@ -0,0 +1,256 @@
+import json
+import os
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl # POSIX only; without it the token bucket is per process
+except ImportError:
+    fcntl = None
+
+try:
+    from . import metrics
+except ImportError:
+    import metrics
+
+DEFAULT_BASE_URL = "https://generativelanguage.googleapis.com/v1beta"
+DEFAULT_MODEL = "gemini-2.5-flash-preview-09-2025"
+
+
+class FileTokenBucket:
+    """
+    Token bucket shared by every worker process on the host.
+    State lives in a small JSON file guarded by an flock, so all gunicorn
+    workers draw from the same quota instead of each assuming it has the full API limit.
+    """
+
+    def __init__(self, path, rate_per_minute, capacity=None):
+        self.path = path
+        self.rate = rate_per_minute / 60.0
+        self.capacity = float(capacity if capacity is not None else max(1, rate_per_minute // 6))
+        self._local = threading.Lock() # flock is per process, threads still need this
+
+    def _update(self, change):
+        """Runs change(state, now) -> result under the cross-process lock."""
+        with self._local, open(self.path, "a+") as file:
+            if fcntl is not None:
+                fcntl.flock(file, fcntl.LOCK_EX)
+            try:
+                file.seek(0)
+                try:
+                    state = json.loads(file.read() or "{}")
+                except ValueError:
+                    state = {}
+
+                now = time.time()
+                tokens = state.get("tokens", self.capacity)
+                updated = state.get("updated", now)
+                state["tokens"] = min(self.capacity, tokens + (now - updated) * self.rate)
+                state["updated"] = now
+                state.setdefault("blocked_until", 0)
+
+                result = change(state, now)
+
+                file.seek(0)
+                file.truncate()
+                file.write(json.dumps(state))
+                file.flush() # before the unlock, or the next process can read the old state
+                return result
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(file, fcntl.LOCK_UN)
+
+    def try_acquire(self):
+        """Takes a token if one is free. Returns 0 on success, else seconds until one will be."""
+        def take(state, now):
+            if now < state["blocked_until"]:
+                return state["blocked_until"] - now
+            if state["tokens"] >= 1:
+                state["tokens"] -= 1
+                return 0
+            return (1 - state["tokens"]) / self.rate
+        return self._update(take)
+
+    def acquire(self, max_wait):
+        """Waits at most max_wait seconds for a token. Returns True if one was taken."""
+        deadline = time.time() + max_wait
+        while True:
+            wait = self.try_acquire()
+            if wait == 0:
+                return True
+            if time.time() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+    def block(self, seconds):
+        """Upstream said slow down (429): every worker stops drawing tokens for a while."""
+        def pause(state, now):
+            state["tokens"] = 0
+            state["blocked_until"] = max(state["blocked_until"], now + seconds)
+        self._update(pause)
+
+
+class CircuitBreaker:
+    """
+    closed -> open after `threshold` consecutive failures, then every call is refused
+    for `cooldown` seconds. After that one trial call is let through (half-open):
+    success closes the breaker, failure opens it again.
+    """
+
+    def __init__(self, threshold=5, cooldown=30):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state(time.time())
+
+    def _state(self, now):
+        if self._opened_at is None:
+            return "closed"
+        return "open" if now - self._opened_at < self.cooldown else "half_open"
+
+    def allow(self):
+        with self._lock:
+            state = self._state(time.time())
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def release(self):
+        """A half-open trial that never reached upstream: let the next call try."""
+        with self._lock:
+            self._trial_running = False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_running or self._failures >= self.threshold:
+                self._opened_at = time.time()
+            self._trial_running = False
+
+
+class GeminiClient:
+    """
+    Keep-alive, rate-limited and circuit-broken access to the Gemini generateContent API.
+    generate() never sleeps for long: it returns None as soon as the quota,
+    the breaker or the upstream says no, and the caller shows its fallback.
+    """
+
+    def __init__(self, api_key, model=DEFAULT_MODEL, base_url=DEFAULT_BASE_URL, timeout=10,
+                 pool_size=4, rate_per_minute=60, bucket_path=None, max_wait=2.0,
+                 max_attempts=2, breaker_threshold=5, breaker_cooldown=30):
+        self.api_key = api_key
+        self.url = f"{base_url.rstrip('/')}/models/{model}:generateContent"
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.max_wait = max_wait
+        self.max_attempts = max_attempts
+
+        bucket_path = bucket_path or os.path.join(tempfile.gettempdir(), "gemini-token-bucket.json")
+        self.bucket = FileTokenBucket(bucket_path, rate_per_minute)
+        self.breaker = CircuitBreaker(breaker_threshold, breaker_cooldown)
+
+        self._session = None
+        self._session_lock = threading.Lock()
+        self._counters = {"requests": 0, "ok": 0, "rate_limited": 0, "errors": 0,
+                          "throttled": 0, "short_circuited": 0}
+
+    @property
+    def session(self):
+        # Created lazily, i.e. after a gunicorn fork, so connections are never shared between processes
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    import requests
+                    from requests.adapters import HTTPAdapter
+
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=0)
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    self._session = session
+        return self._session
+
+    def _count(self, name):
+        with self._session_lock:
+            self._counters[name] += 1
+        metrics.inc("ai_calls_total", outcome=name)
+
+    def generate(self, prompt):
+        """Returns the generated text, or None if no answer could be obtained quickly."""
+        payload = {"contents": [{"parts": [{"text": prompt}]}]}
+
+        for _ in range(self.max_attempts):
+            if not self.breaker.allow():
+                self._count("short_circuited")
+                return None
+            if not self.bucket.acquire(self.max_wait):
+                self._count("throttled")
+                self.breaker.release()
+                return None
+
+            self._count("requests")
+            try:
+                response = self.session.post(
+                    self.url, params={"key": self.api_key}, json=payload, timeout=self.timeout
+                )
+            except Exception:
+                self._count("errors")
+                self.breaker.record_failure()
+                continue
+
+            if response.status_code == 200:
+                try:
+                    text = response.json()['candidates'][0]['content']['parts'][0]['text']
+                except (ValueError, KeyError, IndexError):
+                    self._count("errors")
+                    self.breaker.record_failure()
+                    return None
+                self._count("ok")
+                self.breaker.record_success()
+                return text
+
+            if response.status_code == 429:
+                # Tell every worker to back off instead of sleeping in this request
+                self._count("rate_limited")
+                self.bucket.block(self._retry_after(response))
+                self.breaker.record_failure()
+                continue
+
+            self._count("errors")
+            if response.status_code >= 500:
+                self.breaker.record_failure()
+                continue
+            # 4xx other than 429 won't get better by retrying, nor says anything about upstream health
+            self.breaker.release()
+            return None
+
+        return None
+
+    @staticmethod
+    def _retry_after(response, default=5.0):
+        try:
+            return float(response.headers.get("Retry-After", default))
+        except ValueError:
+            return default
+
+    def stats(self):
+        with self._session_lock:
+            counters = dict(self._counters)
+        return dict(counters, breaker=self.breaker.state)
@@ -0,0 +1,183 @@
+import json
+import threading
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+
+try:
+    from . import caching
+except ImportError:
+    import caching
+
+# Bucket sizes used to quantise the summaries sent to the AI.
+# Summaries that land in the same buckets share one cached insight.
+PERCENT_STEP = 5.0
+METRIC_STEPS = {
+    'Hours_Studied': 2,
+    'Attendance': 5,
+    'Sleep_Hours': 1,
+    'Previous_Scores': 5,
+    'Tutoring_Sessions': 1,
+    'Physical_Activity': 1,
+    'Exam_Score': 2,
+    'predicted_score': 2
+}
+DEFAULT_STEP = 1
+
+
+def bucket(value, step):
+    """Rounds a number to the nearest multiple of step (non-numbers pass through)."""
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return value
+    return round(round(value / step) * step, 2)
+
+
+def quantise_summary(summary, percent_step=PERCENT_STEP):
+    """
+    Canonical, coarse version of an insight summary:
+    - batch: cluster percentages rounded to `percent_step`, raw counts dropped
+    - single: predicted score and numeric metrics bucketed (see METRIC_STEPS)
+    """
+    if summary.get("type") == "batch":
+        return {
+            "type": "batch",
+            "clusters": [
+                {"name": c["name"], "percentage": bucket(c["percentage"], percent_step)}
+                for c in summary["clusters"]
+            ]
+        }
+
+    return {
+        "type": summary.get("type"),
+        "predicted_score": bucket(summary.get("predicted_score"), METRIC_STEPS['predicted_score']),
+        "metrics": {
+            k: bucket(v, METRIC_STEPS.get(k, DEFAULT_STEP))
+            for k, v in sorted(summary.get("metrics", {}).items())
+        }
+    }
+
+
+def summary_key(summary):
+    """Stable string key for an (already quantised) summary."""
+    return json.dumps(summary, sort_keys=True, default=str)
+
+
+class InsightCache:
+    """
+    Memoises AI insights on the quantised summary, with LRU eviction and a TTL.
+    Concurrent requests for the same key share one upstream call (single flight).
+    """
+
+    def __init__(self, max_entries=1024, ttl=6 * 3600, percent_step=PERCENT_STEP, wait_timeout=60):
+        self.cache = caching.ResultCache(max_entries=max_entries, ttl=ttl)
+        self.percent_step = percent_step
+        self.wait_timeout = wait_timeout
+
+        self._inflight = {} # key -> Future shared by everyone waiting on it
+        self._lock = threading.Lock()
+        self._counters = {"upstream_calls": 0, "joined_inflight": 0}
+
+    def peek(self, summary):
+        """Cached insight for `summary` if there is one, without calling upstream."""
+        return self.cache.get(summary_key(quantise_summary(summary, self.percent_step)))
+
+    def get_or_fetch(self, summary, fetch):
+        """
+        Returns the insight for `summary`. On a miss, `fetch(quantised_summary)` is
+        called once for all concurrent callers. fetch returns the insight text,
+        or None on failure (failures are not cached).
+        """
+        quantised = quantise_summary(summary, self.percent_step)
+        key = summary_key(quantised)
+
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        with self._lock:
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = Future()
+                self._counters["upstream_calls"] += 1
+            else:
+                self._counters["joined_inflight"] += 1
+
+        if not leader:
+            try:
+                return flight.result(timeout=self.wait_timeout)
+            except Exception:
+                return None
+
+        result = None
+        try:
+            result = fetch(quantised)
+            if result is not None:
+                self.cache.set(key, result)
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            flight.set_result(result)
+        return result
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters, inflight=len(self._inflight))
+        return dict(self.cache.stats(), **counters)
+
+
+class InsightJobs:
+    """
+    Runs insight generation on a bounded background thread pool so endpoints can
+    answer before the AI does. Job states live in a ResultCache; give it a
+    store_dir and every worker on the host can answer a poll for any job.
+    A job whose function raises is done with `fallback` as its result.
+    """
+
+    def __init__(self, max_workers=4, max_pending=64, ttl=600, store_dir=None, fallback=None):
+        self.max_pending = max_pending
+        self.fallback = fallback
+        self.store = caching.ResultCache(max_entries=0 if store_dir else 1024, ttl=ttl, disk_dir=store_dir)
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="insight")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._counters = {"submitted": 0, "completed": 0, "rejected": 0, "failed": 0}
+
+    def submit(self, fn, *args, on_done=None):
+        """
+        Schedules fn(*args) and returns a job id, or None when too many jobs are queued.
+        on_done(result) is called from the worker thread once fn returns (or raises).
+        """
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._counters["rejected"] += 1
+                return None
+            self._pending += 1
+            self._counters["submitted"] += 1
+
+        job_id = uuid.uuid4().hex
+        self.store.set(job_id, {"status": "pending"})
+        self._executor.submit(self._run, job_id, fn, args, on_done)
+        return job_id
+
+    def status(self, job_id):
+        """{"status": "pending"} / {"status": "done", "ai_insight": ...}, or None for unknown ids."""
+        return self.store.get(job_id)
+
+    def _run(self, job_id, fn, args, on_done):
+        failed = False
+        try:
+            result = fn(*args)
+        except Exception:
+            result, failed = self.fallback, True
+        with self._lock:
+            self._pending -= 1
+            self._counters["completed"] += 1
+            self._counters["failed"] += failed
+        self.store.set(job_id, {"status": "done", "ai_insight": result})
+        if on_done is not None:
+            on_done(result)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counters, pending=self._pending, max_pending=self.max_pending)
@@ -0,0 +1,238 @@
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+
+try:
+    from . import assignment
+except ImportError:
+    import assignment
+
+# Versioned centroid artifact written by the training scripts and read by analyze
+CENTROIDS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "models", "centroids.json")
+CENTROIDS_FORMAT_VERSION = 1
+
+
+def kmeans_plusplus(X, k, rng):
+    """
+    k-means++ seeding. Keeps each point's squared distance to its closest chosen
+    centroid and updates it with one vector operation per new centroid.
+    """
+    centroids = np.empty((k, X.shape[1]), dtype=np.float64)
+    centroids[0] = X[rng.integers(len(X))]
+    closest = ((X - centroids[0]) ** 2).sum(axis=1)
+
+    for i in range(1, k):
+        total = closest.sum()
+        # All points identical to a centroid already: any pick is as good as another
+        idx = rng.choice(len(X), p=closest / total) if total > 0 else rng.integers(len(X))
+        centroids[i] = X[idx]
+        closest = np.minimum(closest, ((X - centroids[i]) ** 2).sum(axis=1))
+
+    return centroids
+
+
+def update_centroids(X, labels, previous):
+    """
+    Mean of the points in every cluster, for all clusters at once.
+    A cluster that lost all its points keeps its previous centroid.
+    """
+    k, d = previous.shape
+    counts = np.bincount(labels, minlength=k)
+    # One weighted bincount per feature is much faster than np.add.at
+    sums = np.stack([np.bincount(labels, weights=X[:, j], minlength=k) for j in range(d)], axis=1)
+
+    centroids = previous.copy()
+    filled = counts > 0
+    centroids[filled] = sums[filled] / counts[filled, None]
+    return centroids
+
+
+def fit(X, k, init=None, max_iter=300, tol=1e-10, seed=None, time_budget=None):
+    """
+    Lloyd's k-means with vectorized assignment and update steps.
+
+    - init: (k, d) starting centroids (warm start); k-means++ seeding when None
+    - max_iter: hard cap on iterations
+    - tol: stop once no centroid moves more than this
+    - seed: makes the seeding reproducible
+    - time_budget: optional seconds after which no new iteration is started
+
+    Returns a dict with centroids, labels, inertia, n_iter and converged.
+    """
+    deadline = None if time_budget is None else time.perf_counter() + time_budget
+    # Column-major: every per-feature pass (distances, bincounts) reads contiguous memory
+    X = np.asfortranarray(X, dtype=np.float64)
+    rng = np.random.default_rng(seed)
+    centroids = kmeans_plusplus(X, k, rng) if init is None else np.array(init, dtype=np.float64)
+
+    converged = False
+    n_iter = 0
+    for n_iter in range(1, max_iter + 1):
+        labels, _ = assignment.nearest_centroid(X, centroids)
+        new_centroids = update_centroids(X, labels, centroids)
+        shift = np.sqrt(((new_centroids - centroids) ** 2).sum(axis=1)).max()
+        centroids = new_centroids
+        if shift < tol:
+            converged = True
+            break
+        if deadline is not None and time.perf_counter() >= deadline:
+            break
+
+    return _result(X, centroids, n_iter, converged)
+
+
+def minibatch_fit(X, init, batch_size=1024, max_iter=100, tol=1e-4, seed=None, time_budget=None):
+    """
+    Mini-batch k-means (Sculley, 2010) from the (k, d) centroids in `init`.
+    Every step assigns `batch_size` random rows and moves each centroid towards
+    its batch mean with a per-centroid learning rate of 1 / points seen so far.
+    Stops after max_iter batches, when no centroid moves more than tol, or when
+    time_budget seconds have passed. The labels and inertia are then computed
+    with one full pass over X.
+
+    Returns the same dict as fit().
+    """
+    deadline = None if time_budget is None else time.perf_counter() + time_budget
+    X = np.asfortranarray(X, dtype=np.float64)
+    rng = np.random.default_rng(seed)
+    centroids = np.array(init, dtype=np.float64)
+    k, d = centroids.shape
+    seen = np.zeros(k)
+
+    converged = False
+    n_iter = 0
+    for n_iter in range(1, max_iter + 1):
+        batch = X[rng.integers(len(X), size=min(batch_size, len(X)))]
+        labels, _ = assignment.nearest_centroid(batch, centroids)
+        counts = np.bincount(labels, minlength=k)
+        sums = np.stack([np.bincount(labels, weights=batch[:, j], minlength=k) for j in range(d)], axis=1)
+
+        seen += counts
+        filled = counts > 0
+        step = (sums[filled] - counts[filled, None] * centroids[filled]) / seen[filled, None]
+        centroids[filled] += step
+
+        if np.sqrt((step ** 2).sum(axis=1)).max(initial=0) < tol:
+            converged = True
+            break
+        if deadline is not None and time.perf_counter() >= deadline:
+            break
+
+    return _result(X, centroids, n_iter, converged)
+
+
+def _result(X, centroids, n_iter, converged):
+    labels, distances = assignment.nearest_centroid(X, centroids)
+    return {
+        "centroids": centroids,
+        "labels": labels,
+        "inertia": float((distances ** 2).sum()),
+        "n_iter": n_iter,
+        "converged": converged
+    }
+
+
+def silhouette_score(X, labels, sample_size=2000, seed=None):
+    """
+    Mean silhouette coefficient, on a random sample of at most `sample_size` rows
+    (the full score needs all n^2 distances). Singleton clusters score 0.
+    """
+    X = np.asarray(X, dtype=np.float64)
+    labels = np.asarray(labels)
+    if sample_size and len(X) > sample_size:
+        idx = np.random.default_rng(seed).choice(len(X), sample_size, replace=False)
+        X, labels = X[idx], labels[idx]
+
+    k = int(labels.max()) + 1
+    if k < 2:
+        return 0.0
+
+    sq = (X ** 2).sum(axis=1)
+    dist = np.sqrt(np.maximum(sq[:, None] + sq[None, :] - 2 * X @ X.T, 0))
+    onehot = np.zeros((len(X), k))
+    onehot[np.arange(len(X)), labels] = 1
+
+    # Summed distance from every point to every cluster
+    sums = dist @ onehot
+    counts = onehot.sum(axis=0)
+    rows = np.arange(len(X))
+    own_counts = counts[labels]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        a = sums[rows, labels] / (own_counts - 1)
+        other = sums / counts
+    other[rows, labels] = np.inf
+    other[:, counts == 0] = np.inf
+    b = other.min(axis=1)
+
+    s = np.where(own_counts > 1, (b - a) / np.maximum(a, b), 0.0)
+    return float(np.nan_to_num(s).mean())
+
+
+def name_clusters(centroids, previous):
+    """
+    Keeps cluster names stable across retrains: each new centroid takes the name of
+    the closest previously named one (greedy, closest pairs first). Centroids
+    left without a match are called clusterN.
+    """
+    names = [None] * len(centroids)
+    if previous:
+        prev_names, prev_table = assignment.centroid_table(previous)
+        if prev_table.shape[1] == centroids.shape[1]:
+            dist = ((centroids[:, None, :] - prev_table[None, :, :]) ** 2).sum(axis=2)
+            taken = set()
+            for flat in np.argsort(dist, axis=None):
+                i, j = np.unravel_index(flat, dist.shape)
+                if names[i] is None and j not in taken:
+                    names[i] = prev_names[j]
+                    taken.add(j)
+
+    used = set(n for n in names if n)
+    counter = 1
+    for i in range(len(names)):
+        while names[i] is None:
+            candidate = f"cluster{counter}"
+            counter += 1
+            if candidate not in used:
+                names[i] = candidate
+                used.add(candidate)
+    return {name: centroids[i].tolist() for i, name in enumerate(names)}
+
+
+def load_centroids(model, path=CENTROIDS_PATH):
+    """
+    {cluster_name: centroid} for `model` ("academic" or "persona") from the artifact,
+    or None when there is no artifact (or no entry for that model).
+    """
+    if not os.path.exists(path):
+        return None
+    with open(path) as file:
+        artifact = json.load(file)
+    if artifact.get("format_version") != CENTROIDS_FORMAT_VERSION:
+        raise ValueError(f"Unsupported centroid artifact format: {artifact.get('format_version')}")
+    entry = artifact.get("models", {}).get(model)
+    return None if entry is None else entry["clusters"]
+
+
+def save_centroids(model, clusters, features, meta=None, path=CENTROIDS_PATH):
+    """
+    Writes (or replaces) the entry for `model` in the centroid artifact.
+    Each entry gets a content-hash version so caches keyed on it are invalidated.
+    """
+    artifact = {"format_version": CENTROIDS_FORMAT_VERSION, "models": {}}
+    if os.path.exists(path):
+        with open(path) as file:
+            artifact = json.load(file)
+
+    entry = {"features": list(features), "clusters": clusters}
+    digest = hashlib.sha256(json.dumps(entry, sort_keys=True).encode()).hexdigest()
+    entry["version"] = f"{model}-{digest[:12]}"
+    entry["meta"] = meta or {}
+    artifact["models"][model] = entry
+
+    with open(path, "w") as file:
+        json.dump(artifact, file, indent=2)
+    return entry
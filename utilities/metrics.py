@@ -0,0 +1,241 @@
+import atexit
+import bisect
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import nullcontext
+
+# Lightweight stage timers and Prometheus metrics.
+#
+# - stage("encode") times a block. The duration goes into the stage_seconds
+#   histogram and into the current request's Server-Timing entries.
+# - observe() / inc() feed the other histograms and counters.
+# - With METRICS=0, stage() returns a shared no-op context manager and nothing is recorded.
+#
+# Each process keeps its own registry. When a folder is configured (METRICS_DIR),
+# every process flushes a snapshot there about once a second, and render() sums the
+# snapshots of all processes, so /metrics is the same on every gunicorn worker.
+
+ENABLED = os.environ.get("METRICS", "1") != "0"
+METRICS_DIR = os.environ.get("METRICS_DIR") or None
+FLUSH_INTERVAL = 1.0
+PREFIX = "student_analytics_"
+
+SECONDS_BUCKETS = [0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60]
+ROWS_BUCKETS = [1, 10, 100, 1000, 10000, 100000, 1000000, 10000000]
+BYTES_BUCKETS = [1e3, 1e4, 1e5, 1e6, 1e7, 1e8, 1e9]
+
+HISTOGRAMS = {
+    "stage_seconds": ("Time spent in each pipeline stage.", SECONDS_BUCKETS),
+    "request_seconds": ("End-to-end request latency.", SECONDS_BUCKETS),
+    "rows_processed": ("Student rows analysed per batch.", ROWS_BUCKETS),
+    "upload_bytes": ("Size of uploaded class files.", BYTES_BUCKETS)
+}
+COUNTERS = {
+    "ai_calls_total": "Gemini client events by outcome."
+}
+
+_NULL = nullcontext()
+_request = threading.local() # Server-Timing entries of the request handled by this thread
+_flush_lock = threading.Lock()
+
+
+class _Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {} # (name, labels) -> [bucket counts..., +Inf count], sum
+        self.counters = {}   # (name, labels) -> value
+        self.dirty = False
+        self.pid = None
+        self.file = None
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "histograms": [[name, list(labels), counts[:], total]
+                               for (name, labels), (counts, total) in self.histograms.items()],
+                "counters": [[name, list(labels), value] for (name, labels), value in self.counters.items()]
+            }
+
+_registry = _Registry()
+
+
+def _labels(labels):
+    return tuple(sorted(labels.items()))
+
+def _muted():
+    # True while this thread handles a request that must not be counted (see begin_request)
+    return getattr(_request, "muted", False)
+
+def observe(name, value, **labels):
+    """Adds one observation to histogram `name` (see HISTOGRAMS)."""
+    if not ENABLED or _muted():
+        return
+    buckets = HISTOGRAMS[name][1]
+    key = (name, _labels(labels))
+    with _registry.lock:
+        entry = _registry.histograms.get(key)
+        if entry is None:
+            entry = _registry.histograms[key] = [[0] * (len(buckets) + 1), 0.0]
+        entry[0][bisect.bisect_left(buckets, value)] += 1
+        entry[1] += value
+        _registry.dirty = True
+    _ensure_flusher()
+
+def inc(name, amount=1, **labels):
+    """Increments counter `name` (see COUNTERS)."""
+    if not ENABLED or _muted():
+        return
+    key = (name, _labels(labels))
+    with _registry.lock:
+        _registry.counters[key] = _registry.counters.get(key, 0) + amount
+        _registry.dirty = True
+    _ensure_flusher()
+
+
+class _Stage:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        observe("stage_seconds", elapsed, stage=self.name)
+        timings = getattr(_request, "timings", None)
+        if timings is not None:
+            timings[self.name] = timings.get(self.name, 0.0) + elapsed
+        return False
+
+def stage(name):
+    """Context manager timing one pipeline stage (a shared no-op when metrics are off)."""
+    return _Stage(name) if ENABLED else _NULL
+
+
+# ---- per request ----
+
+def begin_request(record=True):
+    """
+    Opens the current request. With record=False (worker warm-up) nothing this
+    thread observes is recorded until end_request().
+    """
+    _request.muted = not record
+    _request.timings = None
+    if ENABLED and record:
+        _request.timings = {}
+        _request.start = time.perf_counter()
+
+def end_request(endpoint):
+    """
+    Closes the current request: records its latency and returns the
+    Server-Timing header value (None when metrics are off).
+    """
+    timings = getattr(_request, "timings", None)
+    _request.muted = False
+    if not ENABLED or timings is None:
+        return None
+    total = time.perf_counter() - _request.start
+    _request.timings = None
+    observe("request_seconds", total, endpoint=endpoint)
+
+    entries = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in timings.items()]
+    entries.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(entries)
+
+
+# ---- cross-process aggregation ----
+
+def _ensure_flusher():
+    # Started lazily in each process (e.g. after a gunicorn fork)
+    if METRICS_DIR is None or _registry.pid == os.getpid():
+        return
+    with _registry.lock:
+        if _registry.pid == os.getpid():
+            return
+        _registry.pid = os.getpid()
+        # pid + random suffix: a restarted worker that reuses a pid doesn't overwrite the old counts
+        _registry.file = os.path.join(METRICS_DIR, f"metrics-{os.getpid()}-{uuid.uuid4().hex[:8]}.json")
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    threading.Thread(target=_flush_loop, name="metrics-flush", daemon=True).start()
+    atexit.register(flush)
+
+def _flush_loop():
+    while True:
+        time.sleep(FLUSH_INTERVAL)
+        flush()
+
+def flush():
+    """Writes this process's snapshot to METRICS_DIR if anything changed."""
+    if METRICS_DIR is None or _registry.file is None or not _registry.dirty:
+        return
+    with _flush_lock:
+        _registry.dirty = False
+        tmp_path = _registry.file + ".tmp"
+        try:
+            with open(tmp_path, "w") as file:
+                json.dump(_registry.snapshot(), file)
+            os.replace(tmp_path, _registry.file)
+        except OSError:
+            _registry.dirty = True # try again next time
+
+def _snapshots():
+    if METRICS_DIR is None:
+        return [_registry.snapshot()]
+    flush()
+    snapshots = [] if _registry.file else [_registry.snapshot()]
+    try:
+        names = os.listdir(METRICS_DIR)
+    except OSError:
+        names = []
+    for name in names:
+        if name.startswith("metrics-") and name.endswith(".json"):
+            try:
+                with open(os.path.join(METRICS_DIR, name)) as file:
+                    snapshots.append(json.load(file))
+            except (OSError, ValueError):
+                continue
+    return snapshots
+
+def _format_labels(labels, extra=None):
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+def render():
+    """All metrics of all processes, in the Prometheus text format."""
+    histograms, counters = {}, {}
+    for snapshot in _snapshots():
+        for name, labels, counts, total in snapshot["histograms"]:
+            key = (name, tuple(tuple(pair) for pair in labels))
+            entry = histograms.setdefault(key, [[0] * len(counts), 0.0])
+            entry[0] = [a + b for a, b in zip(entry[0], counts)]
+            entry[1] += total
+        for name, labels, value in snapshot["counters"]:
+            key = (name, tuple(tuple(pair) for pair in labels))
+            counters[key] = counters.get(key, 0) + value
+
+    lines = []
+    for name, (help_text, buckets) in HISTOGRAMS.items():
+        lines += [f"# HELP {PREFIX}{name} {help_text}", f"# TYPE {PREFIX}{name} histogram"]
+        for (metric, labels), (counts, total) in sorted(histograms.items()):
+            if metric != name:
+                continue
+            cumulative = 0
+            for bound, count in zip(buckets + ["+Inf"], counts):
+                cumulative += count
+                lines.append(f"{PREFIX}{name}_bucket{_format_labels(labels, ('le', bound))} {cumulative}")
+            lines.append(f"{PREFIX}{name}_sum{_format_labels(labels)} {total}")
+            lines.append(f"{PREFIX}{name}_count{_format_labels(labels)} {cumulative}")
+    for name, help_text in COUNTERS.items():
+        lines += [f"# HELP {PREFIX}{name} {help_text}", f"# TYPE {PREFIX}{name} counter"]
+        for (metric, labels), value in sorted(counters.items()):
+            if metric == name:
+                lines.append(f"{PREFIX}{name}{_format_labels(labels)} {value}")
+    return "\n".join(lines) + "\n"
@@ -1,5 +1,13 @@
-import pandas as pd
-from math import sqrt
+import numpy as np
+
+try:
+    from . import assignment
+    from . import encoding
+    from . import preprocessing
+except ImportError:
+    import assignment
+    import encoding
+    import preprocessing
 
 # Define the theme mappings globally for easy maintenance
 THEME_MAP = {
@@ -21,11 +29,52 @@ THEME_MAP = {
     ]
 }
 
+def theme_projection(columns=encoding.FEATURE_ORDER):
+    """
+    Scaling and theme averaging are both linear, so together they are one
+    projection: themes = encoded_features @ weights + offset.
+    Built from REFERENCE_DICT (min/max, inversion) and THEME_MAP.
+    Returns a (len(columns), 5) weight matrix and a (5,) offset vector.
+    """
+    position = {col: i for i, col in enumerate(columns)}
+    weights = np.zeros((len(columns), len(THEME_MAP)))
+    offset = np.zeros(len(THEME_MAP))
+
+    for t, theme_cols in enumerate(THEME_MAP.values()):
+        for col in theme_cols:
+            c_min, c_range, inverted = preprocessing.ROW_CONSTANTS[col]
+            # scaled = (x - min) / range, or 1 - that for inverted features
+            slope, intercept = 1.0 / c_range, -c_min / c_range
+            if inverted:
+                slope, intercept = -slope, 1.0 - intercept
+            weights[position[col], t] = slope / len(theme_cols)
+            offset[t] += intercept / len(theme_cols)
+
+    return weights, offset
+
+# Precomputed once for the 19 model features
+THEME_WEIGHTS, THEME_OFFSET = theme_projection()
+
+def project_themes(X):
+    """
+    5-theme matrix straight from an encoded (n, 20) matrix (encoding.COLUMNS),
+    with one matrix product instead of scaling every column and averaging.
+    Rows with missing values fall back to reduce_matrix, which skips NaNs.
+    """
+    features = X[:, :len(encoding.FEATURE_ORDER)]
+    reduced = features @ THEME_WEIGHTS.astype(X.dtype) + THEME_OFFSET.astype(X.dtype)
+
+    incomplete = np.isnan(reduced).any(axis=1)
+    if incomplete.any():
+        reduced[incomplete] = reduce_matrix(preprocessing.scale_matrix(X[incomplete]))
+    return reduced
+
 def reduce_dataframe(scaled_df):
     """
     Reduces a full DataFrame of 20 attributes to 5 thematic features.
     Used for batch CSV uploads on the dashboard.
     """
+    import pandas as pd
     reduced_df = pd.DataFrame()
 
     for theme, columns in THEME_MAP.items():
@@ -42,6 +91,28 @@ def reduce_dataframe(scaled_df):
         
     return reduced_df
 
+def reduce_matrix(scaled, columns=encoding.COLUMNS):
+    """
+    Matrix version of reduce_dataframe: (n, len(columns)) scaled matrix in,
+    (n, 5) theme matrix out, in THEME_MAP order. Missing (NaN) values are
+    skipped when averaging, like DataFrame.mean does; a theme with none of its
+    values is 0.0, as in reduce_record and reduce_dataframe.
+    """
+    position = {col: i for i, col in enumerate(columns)}
+    reduced = np.zeros((len(scaled), len(THEME_MAP)), dtype=scaled.dtype)
+
+    for t, theme_cols in enumerate(THEME_MAP.values()):
+        existing = [position[c] for c in theme_cols if c in position]
+        if not existing:
+            continue # Fallback if no columns found (stays 0.0)
+        block = scaled[:, existing]
+        present = ~np.isnan(block)
+        counts = present.sum(axis=1)
+        total = np.where(present, block, 0).sum(axis=1)
+        reduced[:, t] = np.where(counts > 0, total / np.maximum(counts, 1), 0.0)
+
+    return reduced
+
 def reduce_record(scaled_record):
     """
     Reduces a single student dictionary to 5 thematic features.
@@ -62,38 +133,23 @@ def reduce_record(scaled_record):
     return reduced_record
 
 
+def assign_pc(data5, centroid5):
+    """
+    Vectorized persona assignment on the 5-theme dataframe
+    (or an (n, 5) array from reduce_matrix).
+    Returns (labels, distances) where labels index into the centroid order.
+    """
+    import pandas as pd
+    _, table = assignment.centroid_table(centroid5)
+    # Theme order must match your centroid training order
+    if isinstance(data5, pd.DataFrame):
+        data5 = data5[list(THEME_MAP)].to_numpy(dtype=float)
+    points = data5
+    return assignment.nearest_centroid(points, table)
+
 # this function is for prediction on dataframes not single record
 def predict_pc(data5, centroid5):
-    # 1. Initialize output dictionary
     # Example: {"cluster1": [indices], "cluster2": [indices]...}
-    persona_map = {cluster: [] for cluster in centroid5.keys()}
-
-    def calcdistance(x, y):
-        return sqrt(sum((a - b) ** 2 for a, b in zip(x, y)))
-
-    # 2. Iterate through the 5-theme dataframe
-    for index, row in data5.iterrows():
-        # Theme order must match your centroid training order
-        point = [
-            row['Academic_Drive'], 
-            row['Resource_Access'], 
-            row['Family_Capital'], 
-            row['Personal_Wellbeing'], 
-            row['Environmental_Stability']
-        ]
-        
-        best_cluster = None
-        mindistance = float('inf')
-        
-        # 3. Find the closest Persona centroid
-        for cluster_name, centroid_coords in centroid5.items():
-            dist = calcdistance(point, centroid_coords)
-            if dist < mindistance:
-                mindistance = dist
-                best_cluster = cluster_name
-        
-        # 4. Store the original index
-        persona_map[best_cluster].append(index)
-        
-    return persona_map
-    # this is a dictionary 
\ No newline at end of file
+    labels, _ = assign_pc(data5, centroid5)
+    return assignment.labels_to_map(labels, list(centroid5.keys()), data5.index)
+    # this is a dictionary
@@ -1,87 +1,158 @@
-import pandas as pd
-import joblib
+import numpy as np
+import hashlib
+import json
 import os
 
+try:
+    from . import encoding
+except ImportError:
+    import encoding
+
+# Project-level models folder, independent of the current working directory
+MODELS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "models")
+
+# Compiled Model 3: the MinMaxScaler folded into the regression weights
+LINEAR_MODEL_PATH = os.path.join(MODELS_DIR, "regression_linear.json")
+LINEAR_FORMAT_VERSION = 1
+
 # Initialize global variables for the model and scaler
 _model = None
 _scaler = None
+_linear = None
+_row_weights = None
 
 def load_regression_assets():
+    """
+    Unpickles the original sklearn model and scaler.
+    Only needed for training/export; serving uses load_linear_model().
+    """
     global _model, _scaler
-    
-    # Use relative paths from the project root
-    MODEL_PATH = "models/regression_model.pkl"
-    SCALER_PATH = "models/regression_scaler.pkl"
-    
+    import joblib # Deferred so that serving never imports sklearn through joblib
+
     if _model is None:
-        if os.path.exists(MODEL_PATH):
-            _model = joblib.load(MODEL_PATH)
-        else:
-            # Fallback for when running from within the utilities folder
-            MODEL_PATH = "../models/regression_model.pkl"
-            _model = joblib.load(MODEL_PATH)
-            
+        _model = joblib.load(os.path.join(MODELS_DIR, "regression_model.pkl"))
     if _scaler is None:
-        if os.path.exists(SCALER_PATH):
-            _scaler = joblib.load(SCALER_PATH)
-        else:
-            # Fallback for when running from within the utilities folder
-            SCALER_PATH = "../models/regression_scaler.pkl"
-            _scaler = joblib.load(SCALER_PATH)
-            
+        _scaler = joblib.load(os.path.join(MODELS_DIR, "regression_scaler.pkl"))
+
     return _model, _scaler
 
+def fold_linear_model(model, scaler):
+    """
+    Folds a fitted MinMaxScaler into a fitted LinearRegression.
+    predict(x) = (x * scale_ + min_) . coef_ + intercept_ = x . weights + bias
+    """
+    coef = np.asarray(model.coef_, dtype=np.float64)
+    weights = coef * scaler.scale_
+    bias = float(model.intercept_ + np.dot(scaler.min_, coef))
+    return weights, bias
+
+def export_linear_model(model, scaler, path=LINEAR_MODEL_PATH):
+    """
+    Writes the versioned coefficient artifact read by load_linear_model().
+    Plain JSON, so it doesn't depend on pickle or library versions.
+    """
+    weights, bias = fold_linear_model(model, scaler)
+
+    artifact = {
+        "format_version": LINEAR_FORMAT_VERSION,
+        "features": encoding.FEATURE_ORDER,
+        "weights": weights.tolist(),
+        "bias": bias
+    }
+    # Content hash doubles as the model version (used e.g. in cache keys)
+    digest = hashlib.sha256(json.dumps(artifact, sort_keys=True).encode()).hexdigest()
+    artifact["version"] = f"linear-{digest[:12]}"
+
+    with open(path, "w") as file:
+        json.dump(artifact, file, indent=2)
+    return artifact
+
+def load_linear_model():
+    """
+    Loads the compiled Model 3 once (NumPy only).
+    Returns (weights array in encoding.FEATURE_ORDER, bias, version).
+    Falls back to folding the pickles when the artifact hasn't been exported yet.
+    """
+    global _linear
+    if _linear is None:
+        if os.path.exists(LINEAR_MODEL_PATH):
+            with open(LINEAR_MODEL_PATH) as file:
+                artifact = json.load(file)
+
+            if artifact.get("format_version") != LINEAR_FORMAT_VERSION:
+                raise ValueError(f"Unsupported model artifact format: {artifact.get('format_version')}")
+            if artifact["features"] != encoding.FEATURE_ORDER:
+                raise ValueError("Model artifact features do not match encoding.FEATURE_ORDER")
+
+            _linear = (np.asarray(artifact["weights"], dtype=np.float64), float(artifact["bias"]), artifact["version"])
+        else:
+            weights, bias = fold_linear_model(*load_regression_assets())
+            _linear = (weights, bias, "pickle")
+
+    return _linear
+
+def model_version():
+    """Version string of the serving Model 3."""
+    return load_linear_model()[2]
+
+# Rows per block in predict_matrix
+BLOCK_ROWS = 65536
+
+def predict_matrix(X):
+    """
+    Runs Model 3 on an encoded (n, 19) matrix in encoding.FEATURE_ORDER.
+    Returns an array of n predicted (unscaled) exam scores, one matrix-vector
+    product per block of BLOCK_ROWS rows so float32 input is never widened whole.
+    """
+    weights, bias, _ = load_linear_model()
+    X = np.asarray(X)
+    predicted = np.empty(len(X))
+    for start in range(0, len(X), BLOCK_ROWS):
+        block = np.asarray(X[start:start + BLOCK_ROWS], dtype=np.float64)
+        predicted[start:start + len(block)] = block @ weights + bias
+    return predicted
+
+def row_weights():
+    """Model 3 (weights, bias) as plain Python values, computed once."""
+    global _row_weights
+    if _row_weights is None:
+        weights, bias, _ = load_linear_model()
+        _row_weights = (weights.tolist(), bias)
+    return _row_weights
+
+def predict_row(values):
+    """Model 3 for one encoded row (list of 19 floats in FEATURE_ORDER), without numpy."""
+    weights, bias = row_weights()
+    return sum(x * w for x, w in zip(values, weights)) + bias
+
+def predict_rows(X):
+    """
+    predict_row for every row of a matrix, vectorised across rows but summing
+    features in the same order, so results are bit-identical to predict_row.
+    """
+    weights, bias = row_weights()
+    total = 0
+    for j, w in enumerate(weights):
+        total = total + X[:, j] * w
+    return total + bias
+
 def predict_exam_score(data):
     """
     Independent logic for Mayank's model.
     Accepts dict or DataFrame, returns float or list of floats.
     """
-    model, scaler = load_regression_assets()
-    
-    # Convert dict to DataFrame if necessary
-    df = pd.DataFrame([data]) if isinstance(data, dict) else data.copy()
-    
-    # Comprehensive mapping for ALL categorical columns required by the model
-    mapping = {
-        'Motivation_Level': {'Low': 0, 'Medium': 1, 'High': 2},
-        'Internet_Access': {'No': 0, 'Yes': 1},
-        'Learning_Disabilities': {'No': 0, 'Yes': 1},
-        'School_Type': {'Public': 0, 'Private': 1},
-        'Peer_Influence': {'Negative': 0, 'Neutral': 1, 'Positive': 2},
-        'Parental_Education_Level': {'High School': 0, 'College': 1, 'Postgraduate': 2},
-        'Distance_from_Home': {'Near': 0, 'Moderate': 1, 'Far': 2},
-        'Gender': {'Female': 0, 'Male': 1},
-        'Extracurricular_Activities': {'No': 0, 'Yes': 1},
-        'Access_to_Resources': {'Low': 0, 'Medium': 1, 'High': 2},
-        'Parental_Involvement': {'Low': 0, 'Medium': 1, 'High': 2},
-        'Teacher_Quality': {'Low': 0, 'Medium': 1, 'High': 2},
-        'Family_Income': {'Low': 0, 'Medium': 1, 'High': 2}
-    }
-    
-    # Apply mapping to categorical columns
-    for col, m in mapping.items():
-        if col in df.columns:
-            # map() will turn the string into the number defined in our dictionary
-            # fillna(0) handles cases where a value might be missing or misspelled
-            df[col] = df[col].map(m).fillna(0)
-
     # The model expects exactly 19 features in this specific order
-    feature_order = [
-        'Hours_Studied', 'Attendance', 'Parental_Involvement', 'Access_to_Resources', 
-        'Extracurricular_Activities', 'Sleep_Hours', 'Previous_Scores', 'Motivation_Level', 
-        'Internet_Access', 'Tutoring_Sessions', 'Family_Income', 'Teacher_Quality', 
-        'School_Type', 'Peer_Influence', 'Physical_Activity', 'Learning_Disabilities', 
-        'Parental_Education_Level', 'Distance_from_Home', 'Gender'
-    ]
-    
-    # Ensure only the necessary columns are passed to the scaler
-    X = df[feature_order]
-    
-    # Scale and Predict
-    X_scaled = scaler.transform(X)
-    prediction = model.predict(X_scaled)
-    
-    # Return a single rounded float for dict, or array for DataFrame
     if isinstance(data, dict):
-        return round(float(prediction[0]), 2)
-    return prediction
\ No newline at end of file
+        missing = [c for c in encoding.FEATURE_ORDER if c not in data]
+    else:
+        missing = encoding.missing_columns(data)
+    if missing:
+        raise KeyError(f"Missing model features: {missing}")
+
+    # Same encoding (and missing-value code) as the scaling pipeline.
+    # A single dict takes the plain-Python path and returns a rounded float.
+    if isinstance(data, dict):
+        return round(predict_row(encoding.encode_row(data, encoding.FEATURE_ORDER)), 2)
+
+    # A DataFrame goes through the matrix path and returns an array
+    return predict_matrix(encoding.encode_frame(data, encoding.FEATURE_ORDER))
@@ -1,4 +1,9 @@
-import pandas as pd
+import numpy as np
+
+try:
+    from . import encoding
+except ImportError:
+    import encoding
 
 # Global reference for consistent scaling across the whole app
 REFERENCE_DICT = {
@@ -24,44 +29,39 @@ REFERENCE_DICT = {
     "Exam_Score": {"min": 55.0, "max": 101.0}
 }
 
+# Features where a higher raw value is worse for the student, flipped after scaling
+INVERTED_COLUMNS = ['Distance_from_Home', 'Learning_Disabilities']
+
+def scaling_constants(columns=encoding.COLUMNS, dtype=np.float64):
+    """Per-column (min, range, inverted) arrays for the given column order."""
+    c_min = np.array([REFERENCE_DICT[c]['min'] for c in columns], dtype=dtype)
+    c_range = np.array([REFERENCE_DICT[c]['max'] - REFERENCE_DICT[c]['min'] for c in columns], dtype=dtype)
+    inverted = np.array([c in INVERTED_COLUMNS for c in columns])
+    return c_min, c_range, inverted
+
+def scale_matrix(X, columns=encoding.COLUMNS):
+    """
+    Scales and inverts an encoded matrix (see encoding.encode_frame).
+    Returns a new matrix with the same dtype.
+    """
+    c_min, c_range, inverted = scaling_constants(columns, X.dtype)
+
+    # Standard Scaling
+    scaled = (X - c_min) / c_range
+
+    # Inversion for Negative Features
+    scaled[:, inverted] = 1.0 - scaled[:, inverted]
+    return scaled
+
 def process_dataframe(df):
     """The core logic that maps, scales, and inverts a whole dataframe."""
-    # 1. Mapping
-    mapping_dict = {
-        'Parental_Involvement': {'Low': 0, 'Medium': 1, 'High': 2},
-        'Access_to_Resources': {'Low': 0, 'Medium': 1, 'High': 2},
-        'Motivation_Level': {'Low': 0, 'Medium': 1, 'High': 2},
-        'Family_Income': {'Low': 0, 'Medium': 1, 'High': 2},
-        'Teacher_Quality': {'Low': 0, 'Medium': 1, 'High': 2},
-        'Extracurricular_Activities': {'No': 0, 'Yes': 1},
-        'Internet_Access': {'No': 0, 'Yes': 1},
-        'Learning_Disabilities': {'No': 0, 'Yes': 1},
-        'School_Type': {'Public': 0, 'Private': 1},
-        'Peer_Influence': {'Negative': 0, 'Neutral': 1, 'Positive': 2},
-        'Parental_Education_Level': {'High School': 0, 'College': 1, 'Postgraduate': 2},
-        'Distance_from_Home': {'Near': 0, 'Moderate': 1, 'Far': 2},
-        'Gender': {'Female': 0, 'Male': 1}
-    }
+    columns = [c for c in encoding.COLUMNS if c in df.columns]
 
-    # Apply mapping
-    for col, m in mapping_dict.items():
-        if col in df.columns:
-            # We use .get to handle unexpected strings safely
-            df[col] = df[col].map(m).fillna(-1)
+    # 1. Mapping (one pass through the shared encoder)
+    X = encoding.encode_frame(df, columns, dtype=np.float64)
 
     # 2. Scaling & Inversion
-    for col in df.columns:
-        if col in REFERENCE_DICT:
-            c_min = REFERENCE_DICT[col]['min']
-            c_max = REFERENCE_DICT[col]['max']
-            
-            # Standard Scaling
-            df[col] = (df[col] - c_min) / (c_max - c_min)
-
-            # Inversion for Negative Features
-            if col in ['Distance_from_Home', 'Learning_Disabilities']:
-                df[col] = 1.0 - df[col]
-    
+    df[columns] = scale_matrix(X, columns)
     return df
 
 def scale_csv_file(df):
@@ -69,8 +69,22 @@ def scale_csv_file(df):
     
     return process_dataframe(df)
 
+# (min, range, inverted) per column, for the plain-Python single record path
+ROW_CONSTANTS = {
+    col: (ref['min'], ref['max'] - ref['min'], col in INVERTED_COLUMNS)
+    for col, ref in REFERENCE_DICT.items()
+}
+
+def scale_value(col, value):
+    """Scales (and inverts if needed) one encoded value, same arithmetic as scale_matrix."""
+    c_min, c_range, inverted = ROW_CONSTANTS[col]
+    scaled = (value - c_min) / c_range
+    return 1.0 - scaled if inverted else scaled
+
 def scale_single_record(record_dict):
-    """Helper to process a single student from a dashboard form."""
-    df = pd.DataFrame([record_dict])
-    processed_df = process_dataframe(df)
-    return processed_df.iloc[0].to_dict()
\ No newline at end of file
+    """Helper to process a single student from a dashboard form (no pandas involved)."""
+    processed = dict(record_dict)
+    for col in encoding.COLUMNS:
+        if col in record_dict:
+            processed[col] = scale_value(col, encoding.encode_value(col, record_dict[col]))
+    return processed
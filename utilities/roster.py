@@ -0,0 +1,286 @@
+import os
+import sqlite3
+import time
+
+import numpy as np
+
+try:
+    from . import analyze
+    from . import encoding
+except ImportError:
+    import analyze
+    import encoding
+
+# Persistent class rosters in SQLite, updated by deltas.
+#
+# Every student of a class is stored with its encoded features and its labels.
+# Each student has two academic labels, one on the given Exam_Score and one on
+# Model 3's prediction, because a class re-predicts every score as soon as one is
+# missing (same rule as /analyzeGroup). Two contingency tables are kept per
+# class, 'given' and 'imputed', and a delta only adds its new rows' cells and
+# subtracts the cells of the rows it replaces. The charts therefore cost time
+# proportional to the delta, and they match a full upload of the roster.
+#
+# The features stay stored so that a class is relabelled from the database when
+# the model or the centroids change (analyze.pipeline_version()).
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_PATH = os.path.join(ROOT, "data", "roster.sqlite3")
+ID_COLUMN = analyze.ID_COLUMN
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS classes (
+    class_id TEXT PRIMARY KEY,
+    version TEXT NOT NULL,
+    students INTEGER NOT NULL DEFAULT 0,
+    missing_scores INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS students (
+    class_id TEXT NOT NULL,
+    student_id TEXT NOT NULL,
+    features BLOB NOT NULL,
+    has_score INTEGER NOT NULL,
+    predicted REAL,
+    persona INTEGER NOT NULL,
+    academic_given INTEGER NOT NULL,
+    academic_imputed INTEGER NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (class_id, student_id)
+);
+CREATE TABLE IF NOT EXISTS counts (
+    class_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    academic INTEGER NOT NULL,
+    persona INTEGER NOT NULL,
+    n INTEGER NOT NULL,
+    PRIMARY KEY (class_id, kind, academic, persona)
+);
+"""
+
+# Rows per executemany / IN (...) batch
+BATCH_ROWS = 500
+
+
+def _tables(labels):
+    """'given' (students with a score only) and 'imputed' contingency tables of some students' labels."""
+    n_ac, n_pc = len(analyze.CENTROID3), len(analyze.CENTROID5)
+    has_score = labels["has_score"]
+    persona = labels["persona"].astype(np.int64)
+    given = np.bincount(labels["academic_given"][has_score].astype(np.int64) * n_pc + persona[has_score],
+                        minlength=n_ac * n_pc)
+    imputed = np.bincount(labels["academic_imputed"].astype(np.int64) * n_pc + persona, minlength=n_ac * n_pc)
+    return {"given": given.reshape(n_ac, n_pc), "imputed": imputed.reshape(n_ac, n_pc)}
+
+
+class RosterStore:
+    """
+    SQLite-backed class rosters (one file, shared by every worker on the host).
+    Every call uses its own connection, so the store can be used from any thread.
+    """
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self._ready = False # the file and schema are created on first use
+
+    def _connect(self):
+        if not self._ready:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+        # Autocommit mode: transactions are opened explicitly with BEGIN IMMEDIATE,
+        # so two workers can't both read a student's old labels and update the counts
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        if not self._ready:
+            conn.execute("PRAGMA journal_mode=WAL") # readers don't block the writer
+            conn.executescript(SCHEMA)
+            self._ready = True
+        return conn
+
+    # ---- reads ----
+
+    def _read_tables(self, conn, class_id):
+        n_ac, n_pc = len(analyze.CENTROID3), len(analyze.CENTROID5)
+        tables = {"given": np.zeros((n_ac, n_pc), dtype=np.int64), "imputed": np.zeros((n_ac, n_pc), dtype=np.int64)}
+        for kind, academic, persona, n in conn.execute(
+                "SELECT kind, academic, persona, n FROM counts WHERE class_id = ?", (class_id,)):
+            tables[kind][academic, persona] = n
+        return tables
+
+    def summary(self, class_id):
+        """
+        The class's /analyzeGroup charts plus "class_id", "students", "missing_scores"
+        and "updated_at" ("charts" is None for an empty class), or None for an unknown class.
+        """
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT students, missing_scores, updated_at, version FROM classes WHERE class_id = ?",
+                               (class_id,)).fetchone()
+            if row is None:
+                return None
+            if row[3] != analyze.pipeline_version():
+                # Stored under an older model: relabel once, then read again
+                self._begin(conn, class_id)
+                conn.execute("COMMIT")
+                return self.summary(class_id)
+            students, missing, updated_at, _ = row
+            tables = self._read_tables(conn, class_id)
+        finally:
+            conn.close()
+
+        result = {"class_id": class_id, "students": students, "missing_scores": missing,
+                  "updated_at": updated_at, "charts": None}
+        if students:
+            is_predicted = missing > 0
+            result.update(analyze.batch_charts(tables["imputed" if is_predicted else "given"], is_predicted))
+        return result
+
+    # ---- writes ----
+
+    def _old_labels(self, conn, class_id, student_ids):
+        """Stored labels of the given students that exist: {student_id: (has_score, persona, given, imputed)}."""
+        found = {}
+        for start in range(0, len(student_ids), BATCH_ROWS):
+            batch = student_ids[start:start + BATCH_ROWS]
+            placeholders = ",".join("?" * len(batch))
+            for row in conn.execute(
+                    f"SELECT student_id, has_score, persona, academic_given, academic_imputed FROM students "
+                    f"WHERE class_id = ? AND student_id IN ({placeholders})", [class_id] + batch):
+                found[row[0]] = row[1:]
+        return found
+
+    def _apply_counts(self, conn, class_id, delta):
+        conn.executemany(
+            "INSERT INTO counts (class_id, kind, academic, persona, n) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (class_id, kind, academic, persona) DO UPDATE SET n = n + excluded.n",
+            [(class_id, kind, int(a), int(p), int(table[a, p]))
+             for kind, table in delta.items() for a, p in zip(*np.nonzero(table))]
+        )
+        conn.execute("DELETE FROM counts WHERE class_id = ? AND n = 0", (class_id,))
+
+    def _old_tables(self, old):
+        """Contingency tables of stored label tuples (the rows a delta replaces or removes)."""
+        values = np.array(list(old.values()), dtype=np.int64).reshape(-1, 4)
+        return _tables({"has_score": values[:, 0].astype(bool), "persona": values[:, 1],
+                        "academic_given": values[:, 2], "academic_imputed": values[:, 3]})
+
+    def _begin(self, conn, class_id, create=False):
+        """
+        Opens the write transaction; relabels the class first if the model changed.
+        Returns whether the class exists (an unknown one is created with `create`).
+        """
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute("SELECT version FROM classes WHERE class_id = ?", (class_id,)).fetchone()
+        version = analyze.pipeline_version()
+        if row is None:
+            if not create:
+                return False
+            conn.execute("INSERT INTO classes (class_id, version, updated_at) VALUES (?, ?, ?)",
+                         (class_id, version, time.time()))
+        elif row[0] != version:
+            self._relabel(conn, class_id, version)
+        return True
+
+    def _relabel(self, conn, class_id, version):
+        """Recomputes every label and count of a class from its stored features."""
+        ids, blobs = [], []
+        for student_id, features in conn.execute(
+                "SELECT student_id, features FROM students WHERE class_id = ?", (class_id,)):
+            ids.append(student_id)
+            blobs.append(features)
+        conn.execute("DELETE FROM counts WHERE class_id = ?", (class_id,))
+        if ids:
+            X = np.frombuffer(b"".join(blobs), dtype="<f4").reshape(len(ids), len(encoding.COLUMNS)).copy()
+            labels = analyze.label_students(X)
+            now = time.time()
+            conn.executemany(
+                "UPDATE students SET predicted = ?, persona = ?, academic_given = ?, academic_imputed = ?, "
+                "updated_at = ? WHERE class_id = ? AND student_id = ?",
+                [(p, int(pc), int(ag), int(ai), now, class_id, sid) for sid, p, pc, ag, ai in zip(
+                    ids, labels["predicted"].tolist(), labels["persona"], labels["academic_given"],
+                    labels["academic_imputed"])]
+            )
+            self._apply_counts(conn, class_id, _tables(labels))
+        conn.execute("UPDATE classes SET version = ? WHERE class_id = ?", (version, class_id))
+
+    def apply_delta(self, class_id, data=None, remove=()):
+        """
+        Adds or replaces the students of a delta CSV (path, file-like object or
+        DataFrame with a Student_ID column) and removes the `remove` IDs.
+        Only these rows are encoded, predicted and assigned. Returns the class
+        summary plus "added", "updated" and "removed" counts, or None when only
+        removing from an unknown class (a class is created by its first students).
+        Raises ValueError for an empty delta.
+        """
+        ids, X, labels = [], None, None
+        if data is not None:
+            df = data if hasattr(data, "columns") else encoding.read_csv(data, dtype={ID_COLUMN: str})
+            if ID_COLUMN not in df.columns:
+                raise ValueError(f"Delta rows need a {ID_COLUMN} column")
+            missing = encoding.missing_columns(df)
+            if missing:
+                raise KeyError(f"Missing model features: {missing}")
+            if df[ID_COLUMN].isna().any():
+                raise ValueError(f"Every delta row needs a {ID_COLUMN}")
+            df = df.drop_duplicates(ID_COLUMN, keep="last") # last row of a student wins
+
+            ids = df[ID_COLUMN].astype(str).tolist()
+            X = encoding.encode_frame(df)
+        labels = analyze.label_students(X if X is not None else np.empty((0, len(encoding.COLUMNS)), np.float32))
+        remove = list(dict.fromkeys(str(student_id) for student_id in remove).keys() - set(ids))
+        if not ids and not remove:
+            raise ValueError(f"Empty delta: send students ({ID_COLUMN} rows) and/or IDs to remove")
+
+        conn = self._connect()
+        try:
+            if not self._begin(conn, class_id, create=bool(ids)):
+                conn.execute("ROLLBACK")
+                return None
+            # Counts change by (new rows) - (stored rows they replace) - (removed rows)
+            old = self._old_labels(conn, class_id, ids + remove)
+            new_tables, old_tables = _tables(labels), self._old_tables(old)
+            delta = {kind: new_tables[kind] - old_tables[kind] for kind in new_tables}
+            missing_delta = int((~labels["has_score"]).sum()) - sum(1 for v in old.values() if not v[0])
+            updated = sum(1 for student_id in ids if student_id in old)
+            removed = len(old) - updated
+
+            now = time.time()
+            conn.executemany(
+                "INSERT OR REPLACE INTO students (class_id, student_id, features, has_score, predicted, "
+                "persona, academic_given, academic_imputed, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(class_id, sid, row.astype("<f4").tobytes(), int(has), p, int(pc), int(ag), int(ai), now)
+                 for sid, row, has, p, pc, ag, ai in zip(
+                    ids, X if X is not None else [], labels["has_score"], labels["predicted"].tolist(),
+                    labels["persona"], labels["academic_given"], labels["academic_imputed"])]
+            )
+            for start in range(0, len(remove), BATCH_ROWS):
+                batch = remove[start:start + BATCH_ROWS]
+                conn.execute(f"DELETE FROM students WHERE class_id = ? AND student_id IN "
+                             f"({','.join('?' * len(batch))})", [class_id] + batch)
+
+            self._apply_counts(conn, class_id, delta)
+            conn.execute(
+                "UPDATE classes SET students = students + ?, missing_scores = missing_scores + ?, updated_at = ? "
+                "WHERE class_id = ?", (len(ids) - updated - removed, missing_delta, now, class_id))
+            conn.execute("COMMIT")
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+        return dict(self.summary(class_id), added=len(ids) - updated, updated=updated, removed=removed)
+
+    def delete_class(self, class_id):
+        """Drops a class and its students; returns whether it existed."""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for table in ("students", "counts"):
+                conn.execute(f"DELETE FROM {table} WHERE class_id = ?", (class_id,))
+            existed = conn.execute("DELETE FROM classes WHERE class_id = ?", (class_id,)).rowcount > 0
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+        return existed
@@ -0,0 +1,211 @@
+import numpy as np
+
+try:
+    from . import academics
+    from . import analyze
+    from . import assignment
+    from . import encoding
+    from . import persona
+    from . import predict_score
+    from . import preprocessing
+except ImportError:
+    import academics
+    import analyze
+    import assignment
+    import encoding
+    import persona
+    import predict_score
+    import preprocessing
+
+# What-if scenarios for one student.
+#
+# A grid of changes (numeric: offsets added to the student's value, categorical:
+# levels to try) is expanded into one encoded matrix, one row per scenario, and
+# scored in a single pass through the serving functions: Model 3, the academic
+# scaling, the theme projection and both centroid tables.
+#
+# Every step from the encoded features is affine:
+#   score    = x . w + b
+#   academic = scale(score, Previous_Scores)
+#   themes   = x @ THEME_WEIGHTS + THEME_OFFSET
+# So each feature's effect per unit, and how far it has to move before a cluster
+# changes, have closed forms. Sliders get them without sampling anything.
+
+MAX_SCENARIOS = 100000
+
+PREVIOUS_INDEX = encoding.COLUMN_INDEX['Previous_Scores']
+ACADEMIC_INDEXES = [encoding.COLUMN_INDEX[c] for c in academics.ACADEMIC_COLS]
+
+
+def base_row(record):
+    """Encoded (20,) float64 row of a student dictionary; every model feature is required."""
+    missing = [c for c in encoding.FEATURE_ORDER if c not in record or record[c] in (None, "")]
+    if missing:
+        raise KeyError(f"Missing model features: {missing}")
+    return np.array(encoding.encode_row(record), dtype=np.float64)
+
+def evaluate(X):
+    """
+    Scores an encoded (n, 20) scenario matrix. Exam_Score is replaced by Model 3's
+    prediction in every row, so scenarios are compared on the same footing.
+    Returns (predicted scores, academic labels, persona labels).
+    """
+    X = np.array(X, dtype=np.float64)
+    scores = predict_score.predict_matrix(X[:, :len(encoding.FEATURE_ORDER)])
+    X[:, encoding.EXAM_INDEX] = scores
+
+    # Arrays straight to nearest_centroid: assign_ac / assign_pc would import pandas
+    points = preprocessing.scale_matrix(X[:, ACADEMIC_INDEXES], academics.ACADEMIC_COLS)
+    ac_labels, _ = assignment.nearest_centroid(points, assignment.centroid_table(analyze.CENTROID3)[1])
+    pc_labels, _ = assignment.nearest_centroid(persona.project_themes(X), assignment.centroid_table(analyze.CENTROID5)[1])
+    return scores, ac_labels, pc_labels
+
+def expand_grid(row, grid, clip=True, max_scenarios=MAX_SCENARIOS):
+    """
+    The scenario matrix of a grid {feature: values}: numeric values are offsets
+    from the student's value (clipped to the reference range with `clip`),
+    categorical ones are levels. Scenarios enumerate the product of the axes in
+    grid order, the last axis varying fastest.
+    Returns (X, {feature: absolute values tried}).
+    """
+    axes = {}
+    for feature, values in grid.items():
+        if feature not in encoding.FEATURE_ORDER:
+            raise ValueError(f"Unknown feature in grid: {feature}")
+        if not isinstance(values, list) or not values:
+            raise ValueError(f"Grid values for {feature} must be a non-empty list")
+
+        j = encoding.COLUMN_INDEX[feature]
+        if feature in encoding.CATEGORY_MAPS:
+            unknown = [v for v in values if v not in encoding.CATEGORY_MAPS[feature]]
+            if unknown:
+                raise ValueError(f"Unknown {feature} levels: {unknown}")
+            axes[feature] = (j, np.array([encoding.CATEGORY_MAPS[feature][v] for v in values], dtype=np.float64), values)
+        else:
+            encoded = row[j] + np.asarray(values, dtype=np.float64)
+            if clip:
+                ref = preprocessing.REFERENCE_DICT[feature]
+                encoded = np.clip(encoded, ref['min'], ref['max'])
+            axes[feature] = (j, encoded, encoded.tolist())
+
+    shape = [len(encoded) for _, encoded, _ in axes.values()]
+    n = int(np.prod(shape, dtype=np.int64))
+    if n > max_scenarios:
+        raise ValueError(f"{n} scenarios requested, at most {max_scenarios} allowed")
+
+    X = np.tile(row, (n, 1))
+    for axis, (j, encoded, _) in enumerate(axes.values()):
+        # Value index of this axis for every scenario, C order over `shape`
+        repeat = int(np.prod(shape[axis + 1:], dtype=np.int64))
+        X[:, j] = np.tile(np.repeat(encoded, repeat), n // (repeat * len(encoded)))
+    return X, {feature: values for feature, (_, _, values) in axes.items()}
+
+def _first_flip(point, direction, centroids, current):
+    """
+    Along point + t * direction, the first t > 0 and the last t < 0 at which another
+    centroid becomes the nearest: ((t, index) or None, (t, index) or None).
+    The squared distance gap to centroid k is linear in t, so each crossing is one division.
+    """
+    gap0 = ((point - centroids) ** 2).sum(axis=1) - ((point - centroids[current]) ** 2).sum()
+    slope = 2 * (centroids[current] - centroids) @ direction # d(gap_k)/dt
+    up, down = None, None
+    for k in range(len(centroids)):
+        if k == current or slope[k] == 0:
+            continue
+        t = -gap0[k] / slope[k]
+        if slope[k] < 0 and (up is None or t < up[0]):
+            up = (t, k)
+        elif slope[k] > 0 and (down is None or t > down[0]):
+            down = (t, k)
+    return up, down
+
+def sensitivities(row):
+    """
+    Analytic per-feature effects around an encoded student row.
+    Numeric: score change per unit, and how far the value has to move up or down
+    before the academic cluster or the persona changes (None when that doesn't
+    happen within the feature's reference range). Categorical: the score,
+    academic cluster and persona at every level.
+    """
+    weights, _, _ = predict_score.load_linear_model()
+    score, ac_label, pc_label = [values[0] for values in evaluate(row[None, :])]
+    academic_names, persona_names = list(analyze.CENTROID3), list(analyze.CENTROID5)
+    _, ac_table = assignment.centroid_table(analyze.CENTROID3)
+    _, pc_table = assignment.centroid_table(analyze.CENTROID5)
+
+    X0 = row[None, :].copy()
+    X0[0, encoding.EXAM_INDEX] = score
+    ac_point = preprocessing.scale_matrix(X0[:, ACADEMIC_INDEXES], academics.ACADEMIC_COLS)[0]
+    pc_point = persona.project_themes(X0)[0]
+    # d(scaled value) / d(encoded value) of the two academic coordinates
+    _, ac_range, ac_inverted = preprocessing.scaling_constants(academics.ACADEMIC_COLS)
+    ac_unit = np.where(ac_inverted, -1.0, 1.0) / ac_range
+
+    result = {}
+    for j, feature in enumerate(encoding.FEATURE_ORDER):
+        if feature in encoding.CATEGORY_MAPS:
+            levels = list(encoding.CATEGORY_MAPS[feature])
+            X = np.tile(row, (len(levels), 1))
+            X[:, j] = [encoding.CATEGORY_MAPS[feature][level] for level in levels]
+            scores, ac_labels, pc_labels = evaluate(X)
+            result[feature] = {
+                "type": "categorical",
+                "current": next((level for level in levels if encoding.CATEGORY_MAPS[feature][level] == row[j]), None),
+                "score_per_level": float(weights[j]),
+                "levels": {
+                    level: {"predicted_score": round(float(s), 2), "score_change": round(float(s - score), 2),
+                            "academic_cluster": academic_names[a], "persona": persona_names[p]}
+                    for level, s, a, p in zip(levels, scores, ac_labels, pc_labels)
+                }
+            }
+            continue
+
+        ref = preprocessing.REFERENCE_DICT[feature]
+        ac_direction = ac_unit * [weights[j], 1.0 if j == PREVIOUS_INDEX else 0.0]
+        flips = {}
+        for name, point, direction, table, current, names in (
+                ("academic_cluster", ac_point, ac_direction, ac_table, ac_label, academic_names),
+                ("persona", pc_point, persona.THEME_WEIGHTS[j], pc_table, pc_label, persona_names)):
+            up, down = _first_flip(point, direction, table, current)
+            flips[name] = {
+                side: None if flip is None or not ref['min'] <= row[j] + flip[0] <= ref['max'] else {
+                    "change": round(float(flip[0]), 4), "value": round(float(row[j] + flip[0]), 4), "to": names[flip[1]]
+                }
+                for side, flip in (("increase", up), ("decrease", down))
+            }
+        result[feature] = {"type": "numeric", "current": float(row[j]),
+                           "score_per_unit": float(weights[j]), "flips": flips}
+    return result
+
+def simulate(record, grid, clip=True, max_scenarios=MAX_SCENARIOS, include_sensitivities=True):
+    """
+    What-if analysis for one student dictionary: the baseline, every grid
+    scenario (columnar, see expand_grid for the order) and the sensitivities.
+    """
+    row = base_row(record)
+    baseline = [values[0] for values in evaluate(row[None, :])]
+    X, axes = expand_grid(row, grid, clip, max_scenarios)
+    scores, ac_labels, pc_labels = evaluate(X)
+
+    academic_names, persona_names = list(analyze.CENTROID3), list(analyze.CENTROID5)
+    given = record.get('Exam_Score')
+    result = {
+        "baseline": {
+            "predicted_score": round(float(baseline[0]), 2),
+            "exam_score": None if given in (None, "") else encoding.encode_value('Exam_Score', given),
+            "academic_cluster": academic_names[baseline[1]],
+            "persona": persona_names[baseline[2]]
+        },
+        "academic_names": academic_names,
+        "persona_names": persona_names,
+        "axes": axes,
+        "scenarios": {
+            "count": len(X),
+            "predicted_score": np.round(scores, 2).tolist(),
+            "academic_cluster": ac_labels.tolist(),
+            "persona": pc_labels.tolist()
+        }
+    }
+    if include_sensitivities:
+        result["sensitivities"] = sensitivities(row)
+    return result
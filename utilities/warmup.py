@@ -0,0 +1,102 @@
+import csv
+import gc
+import importlib
+import io
+import os
+import time
+
+try:
+    from . import analyze
+    from . import predict_score
+except ImportError:
+    import analyze
+    import predict_score
+
+# Startup helpers for gunicorn (see gunicorn.conf.py).
+#
+# - preload() runs once in the master before it forks: it imports the modules that
+#   serving defers (pandas for uploads, requests for Gemini) and loads Model 3 and
+#   the centroids, then freezes the GC so workers share those pages copy-on-write.
+# - warm_up(app) runs in each worker before it accepts traffic: one small class
+#   upload and one student go through the real endpoints, so the first user
+#   doesn't pay for lazy imports, template compilation and first-call setup.
+
+# Imported lazily by the code (only batch uploads / AI calls need them), eagerly in preload()
+SERVING_IMPORTS = ("pandas", "requests")
+
+SAMPLE_CSV = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "rawdata.csv")
+WARMUP_ROWS = 200
+
+# Set on the WSGI environ of warm-up requests. Only the in-process test client can
+# set it. For such requests app.py never calls Gemini, skips the result cache and
+# the request batching, and records no metrics.
+ENVIRON_KEY = "student_analytics.warmup"
+
+def _timed(timings, name, fn, *args):
+    start = time.perf_counter()
+    value = fn(*args)
+    timings[name] = round(time.perf_counter() - start, 4)
+    return value
+
+def preload(freeze=True):
+    """
+    Loads everything serving needs once, in the current process.
+    Returns {step: seconds}.
+    """
+    timings = {}
+    for module in SERVING_IMPORTS:
+        try:
+            _timed(timings, f"import {module}", importlib.import_module, module)
+        except ImportError:
+            continue
+
+    _timed(timings, "linear model", predict_score.load_linear_model)
+    _timed(timings, "row weights", predict_score.row_weights)
+    # The centroids are read when analyze is imported; this also hashes them once
+    _timed(timings, "pipeline version", analyze.pipeline_version)
+
+    if freeze:
+        # Objects created so far are never scanned by the GC again, so the
+        # collector doesn't dirty (and un-share) the master's pages after fork
+        gc.collect()
+        gc.freeze()
+    return timings
+
+def sample_requests(path=SAMPLE_CSV, rows=WARMUP_ROWS):
+    """
+    (CSV bytes, student form) for warm-up: the first `rows` students of `path`,
+    with one blank Exam_Score so the Model 3 path runs too.
+    """
+    with open(path, newline="") as file:
+        reader = csv.DictReader(file)
+        records = [record for _, record in zip(range(rows), reader)]
+        columns = reader.fieldnames
+
+    records[-1] = dict(records[-1], Exam_Score="")
+    output = io.StringIO()
+    writer = csv.DictWriter(output, fieldnames=columns)
+    writer.writeheader()
+    writer.writerows(records)
+
+    student = {k: v for k, v in records[0].items() if k != "Exam_Score"}
+    return output.getvalue().encode(), student
+
+def warm_up(app, path=SAMPLE_CSV, rows=WARMUP_ROWS):
+    """
+    Sends one class upload and one student through the app's endpoints.
+    Returns {endpoint: seconds}; raises if an endpoint doesn't answer 200.
+    """
+    csv_bytes, student = sample_requests(path, rows)
+    client = app.test_client()
+    environ = {ENVIRON_KEY: True}
+    timings = {}
+
+    def post(url, data):
+        response = client.post(url, data=data, environ_overrides=environ)
+        if response.status_code != 200:
+            raise RuntimeError(f"Warm-up {url} returned {response.status_code}")
+
+    _timed(timings, "/analyzeGroup", post, "/analyzeGroup",
+           {"csv_file": (io.BytesIO(csv_bytes), "warmup.csv")})
+    _timed(timings, "/analyzeStudent", post, "/analyzeStudent", student)
+    return timings